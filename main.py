@@ -1,25 +1,30 @@
 import sys
 import logging
 import os
-from PyQt6.QtWidgets import QApplication
-from src.gui.custom_widgets import DUO_ToolKit
-from src.tools import tool1, tool2, tool3, tool4
+import multiprocessing
 
-log_dir = 'logs'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+if __name__ == "__main__":
+    # 平行轉換的子行程 (Windows spawn) 會重新載入本檔；PyQt 與各工具只在主程式載入，
+    # 子行程不必載入 Qt，日誌設定放在這裡也不會清空 log
+    multiprocessing.freeze_support()
+    from PyQt6.QtWidgets import QApplication
+    from src.gui.custom_widgets import DUO_ToolKit
+    from src.tools import tool1, tool2, tool3, tool4
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, 'duo_toolkit.log'), mode='w'),
-    ]
-)
+    log_dir = 'logs'
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
 
-logging.debug("This is a test log message")
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, 'duo_toolkit.log'), mode='w'),
+        ]
+    )
+
+    logging.debug("This is a test log message")
 
-if __name__ == "__main__":
     try:
         logging.info("Starting application")
         app = QApplication(sys.argv)
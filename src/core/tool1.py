@@ -0,0 +1,2261 @@
+import io, os, re, json, random, base64, hashlib, mmap, lzma, queue, shutil, struct, tarfile, tempfile, threading, time, zipfile, zlib, logging
+from datetime import datetime, timedelta
+from itertools import chain, islice
+from dataclasses import dataclass, field, replace
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 分組編碼 (Base32/64/85) 需以整組 bytes 切塊，才能逐塊編碼後直接串接；60 為 5、3、4 的公倍數
+BLOCK_SIZE = 60 * 16 * 1024
+TOKEN_WIDTHS = {"Binary": 8, "Hexadecimal": 2}
+CONVERSION_TYPES = ["Binary", "Decimal", "Hexadecimal", "Base32", "Base64", "Base85"]
+MIN_LINE_LENGTHS = {"Binary": 8, "Decimal": 3, "Hexadecimal": 2, "Base32": 1, "Base64": 1, "Base85": 1}
+TIMESTAMP_WIDTH = 23
+MILLISECOND_TEXT = [f"{i:03d}" for i in range(1000)]
+DETECT_SAMPLE_LINES = 64
+DECODE_BATCH_LINES = 8192
+HEADER_PREFIX = "#DUO_TOOLKIT"
+HEADER_WIDTH = 320
+HEADER_FIELDS = ["codec", "size", "sha256", "part", "parts", "offset", "length", "width", "part_sha256", "fec"]
+PARITY_LENGTHS_PREFIX = "#DUO_LENGTHS"
+# 行尾 CRC 格式為 " *xxxxxxxx"；所有編碼的內容都不會同時出現空白與 '*'
+LINE_CRC_WIDTH = 10
+FEC_STRIPE_SIZE = 256 * 1024
+# 含檔頭時，分檔位置需落在完整的編碼單位上，每個分檔才能各自還原
+GROUP_CHARS = {"Base32": 8, "Base64": 4, "Base85": 5}
+GROUP_BYTES = {"Base32": 5, "Base64": 3, "Base85": 4}
+# Base32 結尾的 '=' 數量對應最後一組短少的 bytes
+BASE32_MISSING_BYTES = {0: 0, 1: 1, 3: 2, 4: 3, 6: 4}
+BASE64_CHARS = set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=")
+PARALLEL_TYPES = ["Binary", "Hexadecimal", "Base32", "Base64", "Base85"]
+# 壓縮方式: (封裝格式, 壓縮等級)
+COMPRESSION_TYPES = {
+    "None": (None, None),
+    "ZIP (deflate)": ("zip", 6),
+    "ZIP (deflate, level 9)": ("zip", 9),
+    "TAR.XZ (LZMA)": ("tar.xz", 6),
+    "TAR.XZ (LZMA, extreme)": ("tar.xz", 9 | lzma.PRESET_EXTREME),
+}
+if zstandard is not None:
+    COMPRESSION_TYPES["TAR.ZST (Zstandard)"] = ("tar.zst", 19)
+DELTA_MAGIC = b"DUODELTA1\n"
+# 差異區塊以行尾為切點，平均每 32 行切一塊；沒有換行的資料最多 64 KB 強制切塊
+DELTA_CHUNK_LINES = 32
+DELTA_MAX_CHUNK = 64 * 1024
+# 讀取、編碼、寫入三個階段之間的佇列深度，以及每次交給寫入執行緒的行數
+PIPELINE_DEPTH = 8
+WRITE_BATCH_LINES = 4096
+WRITE_BUFFER_SIZE = 1024 * 1024
+# 續傳檢查點與輸出快取；快取超過上限時由最久未使用的項目開始刪除
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+CACHE_MANIFEST = "manifest.json"
+CACHE_MAX_BYTES = 4 * 1024 ** 3
+# 差異模式每個輸出名稱保存的歷史檔份數；接收端可能晚一次才還原，多留幾份
+HISTORY_COPIES = 3
+# 還原後直接解壓：tar 格式可邊解碼邊解開；ZIP 的目錄在檔尾，先暫存在記憶體，超過上限才寫入暫存檔
+ZIP_MAGIC = b"PK\x03\x04"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+EXTRACT_SPOOL_SIZE = 256 * 1024 * 1024
+# 分檔清單 (manifest) 記錄每個分檔的雜湊與區塊 CRC，供收件端找出損毀的行範圍
+# 區塊大小依分檔行數調整，每個分檔約 MANIFEST_BLOCKS_PER_PART 個區塊，區塊值為區塊內每行 CRC32 的 CRC32
+MANIFEST_SUFFIX = "_manifest.json"
+MANIFEST_BLOCKS_PER_PART = 64
+MANIFEST_MIN_BLOCK_LINES = 4
+# 舊版 manifest 沒有 block_lines，固定每 1000 行一個區塊，區塊值為各行串接後的 CRC32
+MANIFEST_BLOCK_LINES = 1000
+PART_NUMBER = re.compile(r"_(\d+)\.txt$")
+# 批次佇列中每個工作回報進度的最短間隔 (秒)
+BATCH_PROGRESS_INTERVAL = 0.2
+
+
+def read_blocks(file_path, block_size=BLOCK_SIZE, start=0, end=None):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start if end is not None else None
+        while remaining is None or remaining > 0:
+            block = f.read(block_size if remaining is None else min(block_size, remaining))
+            if not block:
+                break
+            if remaining is not None:
+                remaining -= len(block)
+            yield block
+
+
+class Cancelled(Exception):
+    pass
+
+
+def check_cancel(cancel):
+    # cancel 為 threading.Event；由前端設定後，在下一個檢查點中止並清除未完成的輸出
+    if cancel is not None and cancel.is_set():
+        raise Cancelled("Cancelled by user")
+
+
+def remove_parts(parts):
+    for part in parts:
+        if os.path.exists(part["path"]):
+            os.remove(part["path"])
+            logging.info(f"Removed partial file: {part['path']}")
+
+
+def prefetch(iterable, depth=PIPELINE_DEPTH):
+    # 在背景執行緒中先行產生資料，經有界佇列交給下一階段，讓讀取/壓縮與編碼重疊
+    items = queue.Queue(depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((True, item)):
+                    return
+            put((False, None))
+        except Exception as e:
+            put((False, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            ok, item = items.get()
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class BackgroundWriter:
+    # 寫入執行緒：依序處理 (檔案, 資料)，資料為 None 時關閉檔案，檔案為 None 時呼叫資料 (函式)；寫入錯誤在下一次呼叫時拋出
+    def __init__(self, depth=PIPELINE_DEPTH):
+        self.queue = queue.Queue(depth)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            f, data = item
+            try:
+                if f is None:
+                    if self.error is None:
+                        data()
+                elif data is None:
+                    f.close()
+                elif self.error is None:
+                    f.write(data)
+            except Exception as e:
+                self.error = self.error or e
+
+    def write(self, f, data):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((f, data))
+
+    def close(self, f):
+        self.queue.put((f, None))
+
+    def call(self, function):
+        # 在先前排入的寫入與關檔完成後執行
+        self.queue.put((None, function))
+
+    def finish(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+class ChunkReader(io.RawIOBase):
+    # 反向的 BlockSink：把逐塊產生的 bytes 包成可 read() 的檔案物件，供 tarfile 等串流讀取
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer:
+            self.buffer = next(self.chunks, None)
+            if self.buffer is None:
+                self.buffer = b""
+                return 0
+        size = min(len(b), len(self.buffer))
+        b[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+class BlockSink:
+    # 讓 zipfile 等推送式寫入的輸出，可以被逐塊取出交給編碼器
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_input_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            base = os.path.dirname(os.path.abspath(path))
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    yield file_path, os.path.relpath(file_path, base).replace(os.sep, "/")
+        else:
+            yield path, os.path.basename(path)
+
+
+def input_size(paths):
+    return sum(os.path.getsize(file_path) for file_path, _ in iter_input_files(paths))
+
+
+def compressed_size_bound(paths):
+    # 不可壓縮的資料壓縮後會略大於原始大小，另加上每個成員的檔頭
+    return sum(os.path.getsize(file_path) + 1024 for file_path, _ in iter_input_files(paths))
+
+
+def compress_blocks(paths, compression):
+    archive_format, level = COMPRESSION_TYPES[compression]
+    if archive_format == "zip":
+        sink = BlockSink()
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
+            for file_path, arcname in iter_input_files(paths):
+                if hasattr(zipfile.ZipInfo, "compress_level"):
+                    # Python 3.13 起可在 ZipInfo 指定壓縮等級，並保留檔案的修改時間與權限
+                    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                    zinfo.compress_type = zipfile.ZIP_DEFLATED
+                    zinfo.compress_level = level
+                else:
+                    # 較舊的版本只有以名稱開啟時才套用 ZipFile 的壓縮等級，成員不保留修改時間
+                    zinfo = arcname
+                size = os.path.getsize(file_path)
+                with zf.open(zinfo, "w", force_zip64=size * 1.05 > zipfile.ZIP64_LIMIT) as member:
+                    for block in read_blocks(file_path):
+                        member.write(block)
+                        yield sink.take()
+                logging.info(f"Compressed: {file_path}")
+        yield sink.take()
+        return
+
+    if archive_format == "tar.xz":
+        compressor = lzma.LZMACompressor(format=lzma.FORMAT_XZ, preset=level)
+    else:
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    for file_path, arcname in iter_input_files(paths):
+        info = tarfile.TarInfo(arcname)
+        info.size = os.path.getsize(file_path)
+        info.mtime = int(os.path.getmtime(file_path))
+        info.mode = 0o644
+        yield compressor.compress(info.tobuf(format=tarfile.PAX_FORMAT))
+        for block in read_blocks(file_path):
+            yield compressor.compress(block)
+        yield compressor.compress(b"\0" * (-info.size % tarfile.BLOCKSIZE))
+        logging.info(f"Compressed: {file_path}")
+    yield compressor.compress(b"\0" * (2 * tarfile.BLOCKSIZE))
+    yield compressor.flush()
+
+
+def iter_chunks(file_path):
+    # 是否在某行之後切塊只取決於該行內容 (content-defined chunking)，
+    # 因此在檔案中插入或附加資料，只會影響附近的區塊
+    offset = 0
+    chunk = bytearray()
+    carry = b""
+    for block in read_blocks(file_path):
+        lines = (carry + block).split(b"\n")
+        carry = lines.pop()
+        for line in lines:
+            chunk += line + b"\n"
+            if zlib.crc32(line) % DELTA_CHUNK_LINES == 0 or len(chunk) >= DELTA_MAX_CHUNK:
+                yield offset, bytes(chunk)
+                offset += len(chunk)
+                chunk = bytearray()
+        while len(chunk) + len(carry) >= DELTA_MAX_CHUNK:
+            take = DELTA_MAX_CHUNK - len(chunk)
+            chunk += carry[:take]
+            carry = carry[take:]
+            yield offset, bytes(chunk)
+            offset += len(chunk)
+            chunk = bytearray()
+    chunk += carry
+    if chunk:
+        yield offset, bytes(chunk)
+
+
+def chunk_digest(chunk):
+    return hashlib.blake2b(chunk, digest_size=16).digest()
+
+
+def file_sha256(file_path):
+    file_hash = hashlib.sha256()
+    for block in read_blocks(file_path):
+        file_hash.update(block)
+    return file_hash.digest()
+
+
+def delta_ops(base_path, target_path):
+    base_index = {}
+    for offset, chunk in iter_chunks(base_path):
+        base_index.setdefault(chunk_digest(chunk), (offset, len(chunk)))
+
+    copy_offset, copy_length = 0, 0
+    literal = bytearray()
+    for _, chunk in iter_chunks(target_path):
+        match = base_index.get(chunk_digest(chunk))
+        if match is None:
+            if copy_length:
+                yield b"C" + struct.pack(">QI", copy_offset, copy_length)
+                copy_length = 0
+            literal += chunk
+            if len(literal) >= DELTA_MAX_CHUNK:
+                yield b"L" + struct.pack(">I", len(literal)) + bytes(literal)
+                literal = bytearray()
+            continue
+        if literal:
+            yield b"L" + struct.pack(">I", len(literal)) + bytes(literal)
+            literal = bytearray()
+        if copy_length and copy_offset + copy_length == match[0] and copy_length + match[1] < 2 ** 32:
+            copy_length += match[1]
+        else:
+            if copy_length:
+                yield b"C" + struct.pack(">QI", copy_offset, copy_length)
+            copy_offset, copy_length = match
+    if copy_length:
+        yield b"C" + struct.pack(">QI", copy_offset, copy_length)
+    if literal:
+        yield b"L" + struct.pack(">I", len(literal)) + bytes(literal)
+
+
+def delta_blocks(base_path, target_path):
+    # 差異檔格式: DELTA_MAGIC、基準檔 SHA-256、目標檔 SHA-256、目標檔大小、目標檔名，之後為 xz 壓縮的 C(複製)/L(新資料) 指令
+    name = os.path.basename(target_path).encode()
+    yield (DELTA_MAGIC + file_sha256(base_path) + file_sha256(target_path)
+           + struct.pack(">QH", os.path.getsize(target_path), len(name)) + name)
+    compressor = lzma.LZMACompressor(format=lzma.FORMAT_XZ)
+    copied = 0
+    for op in delta_ops(base_path, target_path):
+        if op[:1] == b"C":
+            copied += struct.unpack(">QI", op[1:])[1]
+        yield compressor.compress(op)
+    yield compressor.flush()
+    logging.info(f"Delta against {base_path}: {copied} of {os.path.getsize(target_path)} bytes copied from base")
+
+
+def is_delta(file_path):
+    with open(file_path, "rb") as f:
+        return f.read(len(DELTA_MAGIC)) == DELTA_MAGIC
+
+
+def delta_base_sha256(delta_path):
+    with open(delta_path, "rb") as f:
+        read_exact(f, len(DELTA_MAGIC))
+        return read_exact(f, 32)
+
+
+def read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("The delta data is truncated")
+    return data
+
+
+def apply_delta(delta_path, base_path, output_folder, output_file_name):
+    with open(delta_path, "rb") as delta:
+        read_exact(delta, len(DELTA_MAGIC))
+        base_sha256 = read_exact(delta, 32)
+        target_sha256 = read_exact(delta, 32)
+        target_size, name_length = struct.unpack(">QH", read_exact(delta, 10))
+        target_name = read_exact(delta, name_length).decode()
+        if file_sha256(base_path) != base_sha256:
+            raise ValueError(f"{os.path.basename(base_path)} is not the base this delta was made against")
+
+        output_path = os.path.join(output_folder, output_file_name + os.path.splitext(target_name)[1])
+        target_hash = hashlib.sha256()
+        with lzma.open(delta, "rb") as ops, open(base_path, "rb") as base, open(output_path, "wb") as output:
+            while True:
+                op = ops.read(1)
+                if not op:
+                    break
+                if op == b"C":
+                    offset, length = struct.unpack(">QI", read_exact(ops, 12))
+                    base.seek(offset)
+                    while length:
+                        data = read_exact(base, min(length, BLOCK_SIZE))
+                        target_hash.update(data)
+                        output.write(data)
+                        length -= len(data)
+                elif op == b"L":
+                    length, = struct.unpack(">I", read_exact(ops, 4))
+                    data = read_exact(ops, length)
+                    target_hash.update(data)
+                    output.write(data)
+                else:
+                    raise ValueError("The delta data is corrupt")
+            written = output.tell()
+    if written != target_size or target_hash.digest() != target_sha256:
+        os.remove(output_path)
+        raise ValueError("The file rebuilt from the delta does not match the original checksum")
+    logging.info(f"Rebuilt {output_path} from delta against {base_path}")
+    return output_path
+
+
+def rebatch_blocks(chunks, block_size=BLOCK_SIZE):
+    # 編碼器需要固定大小的區塊 (分組編碼須為整組)，將壓縮輸出重新切成 block_size
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= block_size:
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def archive_extension(file_path):
+    with open(file_path, "rb") as f:
+        magic = f.read(6)
+    if magic == XZ_MAGIC:
+        return ".tar.xz"
+    elif magic.startswith(ZSTD_MAGIC):
+        return ".tar.zst"
+    return ".zip"
+
+
+def streamable_archive(magic):
+    # 可在還原時直接解開的格式；差異檔或其他內容回傳 None，改為先寫出檔案
+    if magic.startswith(XZ_MAGIC):
+        return ".tar.xz"
+    elif magic.startswith(ZSTD_MAGIC) and zstandard is not None:
+        return ".tar.zst"
+    elif magic.startswith(ZIP_MAGIC):
+        return ".zip"
+    return None
+
+
+def extract_tar(tar, destination):
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(destination, filter="data")
+        return
+    # 沒有 data filter 的舊版 Python：逐一檢查成員，只解開一般檔案與資料夾，且不可寫到目的資料夾之外
+    root = os.path.realpath(destination)
+    for member in tar:
+        if not (member.isfile() or member.isdir()):
+            raise ValueError(f"Refusing to extract {member.name}: links and special files are not allowed")
+        path = os.path.realpath(os.path.join(root, member.name))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"Refusing to extract {member.name}: the path is outside the destination folder")
+        # 與 data filter 相同，去除 setuid/setgid 與群組、其他人的寫入權限
+        member.mode &= 0o755
+        tar.extract(member, root)
+
+
+def extract_archive(archive_path, destination):
+    if archive_path.endswith(".tar.zst"):
+        if zstandard is None:
+            raise ValueError("Extracting .tar.zst requires the zstandard package")
+        with open(archive_path, "rb") as f, zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                extract_tar(tar, destination)
+    elif archive_path.endswith(".tar.xz"):
+        with tarfile.open(archive_path, "r:xz") as tar:
+            extract_tar(tar, destination)
+    else:
+        with zipfile.ZipFile(archive_path) as zf:
+            zf.extractall(destination)
+    logging.info(f"Extracted {archive_path} to {destination}")
+
+
+def extract_stream(chunks, archive_type, destination, verify):
+    # 將解碼中的資料直接解開到 destination，不寫出中間的壓縮檔
+    # verify() 在資料全部讀完後檢查雜湊；ZIP 在解開前檢查，tar 於解開後檢查，失敗時由呼叫端刪除 destination
+    chunks = iter(chunks)
+    if archive_type == ".zip":
+        with tempfile.SpooledTemporaryFile(EXTRACT_SPOOL_SIZE, dir=os.path.dirname(destination)) as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+            verify()
+            with zipfile.ZipFile(spool) as zf:
+                zf.extractall(destination)
+        return
+    reader = io.BufferedReader(ChunkReader(chunks), BLOCK_SIZE)
+    if archive_type == ".tar.zst":
+        with zstandard.ZstdDecompressor().stream_reader(reader) as decompressed:
+            with tarfile.open(fileobj=decompressed, mode="r|") as tar:
+                extract_tar(tar, destination)
+    else:
+        with tarfile.open(fileobj=reader, mode="r|xz") as tar:
+            extract_tar(tar, destination)
+    # tar 結尾之後可能還有填充資料，讀完才能比對整體雜湊
+    for _ in chunks:
+        pass
+    verify()
+
+
+def merge_folder(source, destination):
+    # 將解開的暫存資料夾併入目的資料夾，同名檔案覆蓋
+    os.makedirs(destination, exist_ok=True)
+    for name in os.listdir(source):
+        source_path, destination_path = os.path.join(source, name), os.path.join(destination, name)
+        if os.path.isdir(source_path) and os.path.isdir(destination_path):
+            merge_folder(source_path, destination_path)
+        else:
+            if os.path.isdir(destination_path):
+                shutil.rmtree(destination_path)
+            os.replace(source_path, destination_path)
+
+
+def hash_blocks(blocks, hasher):
+    for block in blocks:
+        hasher.update(block)
+        yield block
+
+
+BINARY_TABLE = [format(byte, '08b') for byte in range(256)]
+DECIMAL_TABLE = [str(byte) for byte in range(256)]
+BINARY_DECODE_TABLE = {format(byte, '08b'): byte for byte in range(256)}
+DECIMAL_DECODE_TABLE = {str(byte): byte for byte in range(256)}
+
+
+def encode_block(block, conversion_type):
+    if conversion_type == "Binary":
+        return ' '.join(map(BINARY_TABLE.__getitem__, block))
+    elif conversion_type == "Decimal":
+        return ' '.join(map(DECIMAL_TABLE.__getitem__, block))
+    elif conversion_type == "Hexadecimal":
+        return block.hex(' ')
+    elif conversion_type == "Base32":
+        return base64.b32encode(block).decode()
+    elif conversion_type == "Base64":
+        return base64.b64encode(block).decode()
+    elif conversion_type == "Base85":
+        return base64.b85encode(block).decode()
+    raise ValueError(f"Unsupported conversion type: {conversion_type}")
+
+
+def decode_text(text, conversion_type):
+    if conversion_type == "Binary":
+        return bytes(map(BINARY_DECODE_TABLE.__getitem__, text.split()))
+    elif conversion_type == "Decimal":
+        return bytes(map(DECIMAL_DECODE_TABLE.__getitem__, text.split()))
+    elif conversion_type == "Hexadecimal":
+        return bytes.fromhex(text)
+    elif conversion_type == "Base32":
+        # 部分郵件閘道會改變大小寫
+        return base64.b32decode(text, casefold=True)
+    elif conversion_type == "Base64":
+        return base64.b64decode(text)
+    elif conversion_type == "Base85":
+        return base64.b85decode(text)
+    raise ValueError(f"Unsupported conversion type: {conversion_type}")
+
+
+def wrap_blocks(blocks, conversion_type, width, skip_chars=0):
+    # 每塊的最後一行可能尚未填滿，保留到下一塊再一起換行，結果與整份 textwrap.fill 相同
+    # skip_chars 用於從編碼組中間開始的分檔 (平行轉換)
+    carry = b"" if conversion_type in TOKEN_WIDTHS else ""
+    if conversion_type in TOKEN_WIDTHS:
+        bytes_per_line = (width + 1) // (TOKEN_WIDTHS[conversion_type] + 1)
+        line_step = bytes_per_line * (TOKEN_WIDTHS[conversion_type] + 1)
+    elif conversion_type == "Decimal":
+        line_pattern = re.compile(r'(\S.{0,%d})(?: |$)' % (width - 1))
+
+    for block in blocks:
+        if conversion_type in TOKEN_WIDTHS:
+            block = carry + block
+            end = len(block) - len(block) % bytes_per_line
+            text = encode_block(block[:end], conversion_type)
+            for i in range(0, len(text), line_step):
+                yield text[i:i + line_step - 1]
+            carry = block[end:]
+        elif conversion_type in GROUP_CHARS:
+            text = carry + encode_block(block, conversion_type)[skip_chars:]
+            skip_chars = 0
+            end = len(text) - len(text) % width
+            for i in range(0, end, width):
+                yield text[i:i + width]
+            carry = text[end:]
+        else:
+            text = encode_block(block, conversion_type)
+            lines = line_pattern.findall(f"{carry} {text}" if carry else text)
+            carry = lines.pop() if lines else ""
+            yield from lines
+    if carry:
+        yield encode_block(carry, conversion_type) if conversion_type in TOKEN_WIDTHS else carry
+
+
+def count_part_length(task):
+    return sum(decoded_size(line, task["codec"]) for line in read_payload_lines([task["path"]]))
+
+
+def decode_part(task):
+    header = task["header"]
+    lines = read_payload_lines([task["path"]], [header] if header else None)
+    offset = task["offset"]
+    end = task["offset"] + task["length"]
+    with open(task["output_path"], "r+b") as f, mmap.mmap(f.fileno(), 0) as output:
+        for chunk in decode_lines(lines, task["codec"]):
+            if offset + len(chunk) > end:
+                raise ValueError(f"{os.path.basename(task['path'])} contains more data than expected")
+            output[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+    if offset != end:
+        raise ValueError(f"{os.path.basename(task['path'])} contains less data than expected")
+
+
+def restore_parallel(file_paths, headers, conversion_type, output_path, progress=None):
+    # 各分檔由子行程解碼後直接寫入預先配置好大小的輸出檔 (mmap) 對應位置
+    # progress(已完成的分檔檔案大小, 分檔編號) 在每個分檔完成時呼叫，可拋出 Cancelled 中止
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        if headers:
+            offsets = [header["offset"] for header in headers]
+            lengths = [header["length"] for header in headers]
+        else:
+            # 無檔頭時，由固定的編碼寬度逐行推算各分檔的長度
+            lengths = list(executor.map(count_part_length, [{"path": path, "codec": conversion_type} for path in file_paths]))
+            offsets = [sum(lengths[:i]) for i in range(len(lengths))]
+
+        with open(output_path, "wb") as f:
+            f.truncate(sum(lengths))
+        if sum(lengths) == 0:
+            return
+
+        tasks = [{"path": path, "header": headers[i] if headers else None, "codec": conversion_type,
+                  "offset": offsets[i], "length": lengths[i], "output_path": output_path}
+                 for i, path in enumerate(file_paths)]
+        futures = {executor.submit(decode_part, task): i + 1 for i, task in enumerate(tasks)}
+        try:
+            done = 0
+            for future in as_completed(futures):
+                future.result()
+                done += os.path.getsize(file_paths[futures[future] - 1])
+                if progress is not None:
+                    progress(done, futures[future])
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+    logging.info(f"Restored {len(file_paths)} part(s) in parallel")
+
+
+def strip_timestamp(line):
+    # 時間戳記固定為 23 字元 (YYYY/MM/DD HH:MM:SS.mmm)，以切片取代逐行 re.sub
+    if len(line) > TIMESTAMP_WIDTH and line[4] == '/' and line[13] == ':' and line[19] == '.':
+        return line[TIMESTAMP_WIDTH:].strip()
+    return line.strip()
+
+
+def read_payload_lines(file_paths, headers=None):
+    # 有檔頭時逐一驗證分檔雜湊，損毀的分檔在讀完時即報錯
+    # 行尾 CRC 不符但整個分檔的雜湊正確時，表示只有 CRC 本身損毀，內容仍可使用
+    for i, file_path in enumerate(file_paths):
+        header = headers[i] if headers else None
+        part_hash = hashlib.sha256()
+        damaged_lines = []
+        with open(file_path, "r") as f:
+            for number, line in enumerate(f, 1):
+                if line.startswith("#"):
+                    continue
+                payload, crc_ok = split_line_crc(strip_timestamp(line))
+                if not crc_ok:
+                    if not header:
+                        raise ValueError(f"{os.path.basename(file_path)} line {number} is damaged: CRC mismatch")
+                    damaged_lines.append(number)
+                if payload:
+                    if header:
+                        part_hash.update(payload.encode() + b"\n")
+                    yield payload
+        if header and part_hash.hexdigest() != header["part_sha256"]:
+            lines = f" (damaged lines: {', '.join(map(str, damaged_lines[:20]))})" if damaged_lines else ""
+            raise ValueError(f"Part {header['part']} ({os.path.basename(file_path)}) is corrupt: checksum mismatch{lines}")
+        if damaged_lines:
+            logging.warning(f"{os.path.basename(file_path)} has a damaged line CRC on line(s) "
+                            f"{', '.join(map(str, damaged_lines[:20]))}, but the part checksum matches; using the data")
+        logging.info(f"Read file: {file_path}")
+
+
+def line_crc(payload):
+    return f" *{zlib.crc32(payload.encode()):08x}"
+
+
+def split_line_crc(payload):
+    # 回傳 (去除 CRC 的內容, CRC 是否正確)；沒有 CRC 的行視為正確
+    if len(payload) > LINE_CRC_WIDTH and payload[-LINE_CRC_WIDTH:-LINE_CRC_WIDTH + 2] == " *":
+        data = payload[:-LINE_CRC_WIDTH]
+        return data, line_crc(data) == payload[-LINE_CRC_WIDTH:]
+    return payload, True
+
+
+def verify_part(file_path, header):
+    # 回傳 (分檔雜湊是否正確, CRC 錯誤的行號)；雜湊正確時 CRC 錯誤只代表行尾 CRC 本身損毀
+    part_hash = hashlib.sha256()
+    damaged_lines = []
+    with open(file_path, "r") as f:
+        for number, line in enumerate(f, 1):
+            if line.startswith("#"):
+                continue
+            payload, crc_ok = split_line_crc(strip_timestamp(line))
+            if not crc_ok:
+                damaged_lines.append(number)
+            if payload:
+                part_hash.update(payload.encode() + b"\n")
+    return part_hash.hexdigest() == header["part_sha256"], damaged_lines
+
+
+def conversion_type_candidates(tokens):
+    # 依優先順序列出字元組成符合樣本的編碼
+    candidates = []
+    if all(len(b) == 8 and not b.strip('01') for b in tokens):  # 二進制
+        candidates.append("Binary")
+    if all(b.isdigit() for b in tokens):  # 十進制
+        candidates.append("Decimal")
+    if all(len(b) % 2 == 0 and not b.strip('0123456789abcdefABCDEF') for b in tokens):  # 十六進制
+        candidates.append("Hexadecimal")
+    if all(not b.upper().strip('ABCDEFGHIJKLMNOPQRSTUVWXYZ234567=') for b in tokens):
+        candidates.append("Base32")
+    if all(c in BASE64_CHARS for b in tokens for c in b):
+        candidates.append("Base64")
+    candidates.append("Base85")
+    return candidates
+
+
+def sample_decodes(sample_lines, conversion_type, complete):
+    # 樣本不是全部內容時，分組編碼只驗證完整的編碼組
+    if conversion_type in GROUP_CHARS:
+        text = ''.join(sample_lines)
+        if not complete:
+            text = text[:len(text) - len(text) % GROUP_CHARS[conversion_type]]
+    else:
+        text = ' '.join(sample_lines)
+    try:
+        decode_text(text, conversion_type)
+    except (ValueError, KeyError):
+        return False
+    return True
+
+
+def detect_conversion_type(sample_lines, remaining_lines=None):
+    # 以樣本能正確解碼的第一個候選編碼為準，例如長度不是 8 的倍數的短 Base64 不會被當成 Base32
+    # 樣本全是兩位數字時 Decimal 與 Hexadecimal 無法區分，remaining_lines() 回傳樣本之後的內容，逐行檢查到能區分為止
+    tokens = ' '.join(sample_lines).split()
+    if not tokens:
+        raise ValueError("No data found in the selected files")
+    complete = remaining_lines is None or len(sample_lines) < DETECT_SAMPLE_LINES
+    candidates = conversion_type_candidates(tokens)
+    if "Decimal" in candidates and "Hexadecimal" in candidates and not complete and all(len(b) == 2 for b in tokens):
+        logging.info("Sample is ambiguous between Decimal and Hexadecimal, checking the rest of the data")
+        for line in remaining_lines():
+            tokens = line.split()
+            if any(len(b) != 2 for b in tokens):
+                candidates.remove("Hexadecimal")
+                break
+            if not all(b.isdigit() for b in tokens):
+                candidates.remove("Decimal")
+                break
+    for conversion_type in candidates:
+        if sample_decodes(sample_lines, conversion_type, complete):
+            return conversion_type
+        logging.info(f"Data is not valid {conversion_type}, trying the next candidate")
+    raise ValueError("Cannot detect the conversion type of the selected files")
+
+
+def decode_lines(lines, conversion_type, batch_lines=DECODE_BATCH_LINES):
+    carry = ""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) < batch_lines:
+            continue
+        if conversion_type in GROUP_CHARS:
+            text = carry + ''.join(batch)
+            end = len(text) - len(text) % GROUP_CHARS[conversion_type]
+            carry = text[end:]
+            yield decode_text(text[:end], conversion_type)
+        else:
+            yield decode_text(' '.join(batch), conversion_type)
+        batch = []
+    if conversion_type in GROUP_CHARS:
+        yield decode_text(carry + ''.join(batch), conversion_type)
+    elif batch:
+        yield decode_text(' '.join(batch), conversion_type)
+
+
+def bytes_per_line(conversion_type, width):
+    return (width + 1) // (TOKEN_WIDTHS[conversion_type] + 1)
+
+
+def payload_line_length(conversion_type, width):
+    if conversion_type in TOKEN_WIDTHS:
+        return bytes_per_line(conversion_type, width) * (TOKEN_WIDTHS[conversion_type] + 1) - 1
+    return width
+
+
+def encoded_chars(size, conversion_type):
+    if conversion_type == "Base85":
+        # Base85 不補齊，最後不足 4 bytes 的組輸出 n + 1 個字元
+        return size // 4 * 5 + (size % 4 + 1 if size % 4 else 0)
+    return -(-size // GROUP_BYTES[conversion_type]) * GROUP_CHARS[conversion_type]
+
+
+def estimate_wrapped_lines(size, conversion_type, width):
+    # 壓縮後的大小事先未知，以原始大小估計行數上限，讓時間戳記不會超出所選區間
+    if conversion_type == "Decimal":
+        return -(-size // ((width + 1) // 4))
+    elif conversion_type in GROUP_CHARS:
+        return -(-encoded_chars(size, conversion_type) // width)
+    return -(-size // bytes_per_line(conversion_type, width))
+
+
+def count_wrapped_lines(file_path, conversion_type, width):
+    size = os.path.getsize(file_path)
+    if conversion_type in GROUP_CHARS:
+        return -(-encoded_chars(size, conversion_type) // width)
+    if conversion_type in TOKEN_WIDTHS:
+        return -(-size // bytes_per_line(conversion_type, width))
+    return sum(1 for _ in wrap_blocks(read_blocks(file_path), conversion_type, width))
+
+
+def plan_parts(file_size, conversion_type, width, max_file_size, write_header, with_line_crc=False):
+    # 固定寬度的編碼每行長度相同，可直接算出每個分檔涵蓋的行數範圍
+    if conversion_type in GROUP_CHARS:
+        total_lines = -(-encoded_chars(file_size, conversion_type) // width)
+    else:
+        total_lines = -(-file_size // bytes_per_line(conversion_type, width))
+    line_length = TIMESTAMP_WIDTH + 1 + payload_line_length(conversion_type, width) + (LINE_CRC_WIDTH if with_line_crc else 0)
+    lines_per_part = -(-max_file_size // line_length)
+    if write_header and conversion_type in GROUP_CHARS:
+        while lines_per_part * width % GROUP_CHARS[conversion_type]:
+            lines_per_part += 1
+    return total_lines, [(first, min(first + lines_per_part, total_lines)) for first in range(0, total_lines, lines_per_part)]
+
+
+def line_byte_range(file_size, conversion_type, width, first_line, last_line):
+    # 回傳 (起始 byte, 結束 byte, 需略過的字元數)
+    if conversion_type in GROUP_CHARS:
+        group_chars = GROUP_CHARS[conversion_type]
+        first_group = first_line * width // group_chars
+        last_group = -(-(last_line * width) // group_chars)
+        start = first_group * GROUP_BYTES[conversion_type]
+        end = min(last_group * GROUP_BYTES[conversion_type], file_size)
+        return start, end, first_line * width - first_group * group_chars
+    line_bytes = bytes_per_line(conversion_type, width)
+    return first_line * line_bytes, min(last_line * line_bytes, file_size), 0
+
+
+def encode_part(task):
+    start, end, skip_chars = line_byte_range(task["size"], task["codec"], task["width"], task["first_line"], task["last_line"])
+    blocks = prefetch(read_blocks(task["input_path"], start=start, end=end))
+    lines = islice(wrap_blocks(blocks, task["codec"], task["width"], skip_chars), task["last_line"] - task["first_line"])
+    timestamps = generate_timestamps(task["start_time"], task["end_time"], task["total_lines"], task["first_line"], task["seed"])
+    return write_parts(lines, timestamps, task["output_folder"], task["output_file_name"], float("inf"),
+                       task["codec"] if task["write_header"] else None, task["part"], task["with_line_crc"],
+                       with_manifest=task["with_manifest"])[0]
+
+
+def encode_parallel(input_path, conversion_type, width, max_file_size, start_time, end_time,
+                    output_folder, output_file_name, write_header, archive_hash=None, with_line_crc=False, seed=None,
+                    progress=None, completed_parts=(), on_part=None, with_manifest=False):
+    # progress(已完成行數, 分檔編號) 在每個分檔完成時呼叫，可拋出 Cancelled 中止
+    # completed_parts 為續傳時已完成的分檔編號，略過不重新編碼；回傳本次寫出的分檔
+    file_size = os.path.getsize(input_path)
+    total_lines, ranges = plan_parts(file_size, conversion_type, width, max_file_size, write_header, with_line_crc)
+    tasks = [{"input_path": input_path, "size": file_size, "codec": conversion_type, "width": width,
+              "first_line": first_line, "last_line": last_line, "total_lines": total_lines,
+              "start_time": start_time, "end_time": end_time, "output_folder": output_folder,
+              "output_file_name": output_file_name, "write_header": write_header, "part": i + 1,
+              "with_line_crc": with_line_crc, "seed": seed, "with_manifest": with_manifest}
+             for i, (first_line, last_line) in enumerate(ranges) if i + 1 not in completed_parts]
+
+    parts = []
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {executor.submit(encode_part, task): task for task in tasks}
+        try:
+            if archive_hash is not None:
+                for block in read_blocks(input_path):
+                    archive_hash.update(block)
+            lines_done = sum(last_line - first_line for i, (first_line, last_line) in enumerate(ranges) if i + 1 in completed_parts)
+            for future in as_completed(futures):
+                parts.append(future.result())
+                if on_part is not None:
+                    on_part(parts[-1])
+                lines_done += futures[future]["last_line"] - futures[future]["first_line"]
+                if progress is not None:
+                    progress(lines_done, futures[future]["part"])
+        except BaseException as e:
+            executor.shutdown(cancel_futures=True)
+            # 取消時刪除全部分檔；其他錯誤只刪除未完成的分檔
+            finished = set() if isinstance(e, Cancelled) or on_part is None else {part["part"] for part in parts}
+            remove_parts([{"path": os.path.join(output_folder, f"{output_file_name}_{task['part']}.txt")}
+                          for task in tasks if task["part"] not in finished])
+            raise
+    parts.sort(key=lambda part: part["part"])
+    for part in parts:
+        logging.info(f"Saved file: {part['path']}")
+    return parts
+
+
+def generate_timestamps(start_time, end_time, total_lines, first_line=0, seed=None):
+    # 以整數微秒累加取代 datetime 運算；日期與時分秒字串只在跨日、跨秒時重新格式化
+    # seed 有值時使用獨立的亂數產生器，相同輸入會得到逐位元相同的分檔
+    rng = random.Random(seed) if seed is not None else random
+    time_delta = (end_time - start_time) / total_lines if total_lines > 0 else timedelta(0)
+    step = time_delta // timedelta(microseconds=1)
+    midnight = datetime(start_time.year, start_time.month, start_time.day)
+    offset = (start_time - midnight) // timedelta(microseconds=1) + step * first_line
+    # 從中間開始的分檔重播前 first_line 行的毫秒抖動，亂數狀態與依序產生時相同；抖動通常在十幾行內遞增到 999
+    previous_milliseconds = 0
+    for _ in range(first_line):
+        if previous_milliseconds == 999:
+            break
+        previous_milliseconds = rng.randint(previous_milliseconds + 1, 999)
+    current_day = current_second = None
+
+    while True:
+        if previous_milliseconds < 999:
+            previous_milliseconds = rng.randint(previous_milliseconds + 1, 999)
+        seconds, milliseconds = divmod(offset // 1000 + previous_milliseconds, 1000)
+        if seconds != current_second:
+            current_second = seconds
+            day, seconds = divmod(seconds, 86400)
+            if day != current_day:
+                current_day = day
+                date_prefix = (midnight + timedelta(days=day)).strftime('%Y/%m/%d ')
+            hours, seconds = divmod(seconds, 3600)
+            minutes, seconds = divmod(seconds, 60)
+            second_prefix = f"{date_prefix}{hours:02d}:{minutes:02d}:{seconds:02d}."
+        yield second_prefix + MILLISECOND_TEXT[milliseconds]
+        offset += step
+
+
+def decoded_size(payload, conversion_type):
+    if conversion_type in TOKEN_WIDTHS:
+        return (len(payload) + 1) // (TOKEN_WIDTHS[conversion_type] + 1)
+    elif conversion_type == "Decimal":
+        return payload.count(' ') + 1
+    # 分組編碼在整組結束時才換算成 bytes，此處回傳字元數
+    return len(payload)
+
+
+def group_bytes(chars, padding, conversion_type):
+    if conversion_type == "Base32":
+        return chars // 8 * 5 - BASE32_MISSING_BYTES[padding]
+    elif conversion_type == "Base64":
+        return chars // 4 * 3 - padding
+    elif conversion_type == "Base85":
+        return chars // 5 * 4 + max(chars % 5 - 1, 0)
+    return chars
+
+
+def format_header(fields):
+    header = ' '.join([HEADER_PREFIX] + [f"{key}={fields[key]}" for key in HEADER_FIELDS])
+    return header.ljust(HEADER_WIDTH)
+
+
+def parse_header(line):
+    if not line.startswith(HEADER_PREFIX):
+        return None
+    fields = dict(item.split('=', 1) for item in line.split()[1:])
+    fields.setdefault("fec", "0")
+    for key in ["size", "part", "parts", "offset", "length", "width", "fec"]:
+        fields[key] = int(fields[key])
+    return fields
+
+
+def read_part_header(file_path):
+    with open(file_path, "r") as f:
+        return parse_header(f.readline())
+
+
+def write_parts(lines, timestamps, output_folder, output_file_name, max_file_size, conversion_type=None, first_part=1,
+                with_line_crc=False, preamble=None, progress=None, on_part=None, with_manifest=False):
+    # conversion_type 有值時為每個分檔預留檔頭，並記錄各分檔的位移、長度與雜湊
+    # with_manifest 時於寫出的同時記錄 manifest 所需的內容雜湊與每區塊 CRC，不必事後重新讀取分檔
+    # 輸出行累積成批次後交給寫入執行緒，以二進位大緩衝寫入；換行沿用文字模式的 os.linesep
+    # progress(已寫出行數, 分檔編號) 在每批寫出時呼叫，可拋出 Cancelled 中止
+    # on_part(分檔) 在分檔完整寫入並關閉後呼叫，供續傳檢查點記錄
+    parts = []
+    current_file_size = 0
+    lines_written = 0
+    f = None
+    pending = []
+    writer = BackgroundWriter()
+
+    def flush():
+        writer.write(f, (os.linesep.join(pending) + os.linesep).encode())
+        pending.clear()
+        if progress is not None:
+            progress(lines_written, part_number)
+
+    def update_digests():
+        # 內容雜湊與每行 CRC 每 WRITE_BATCH_LINES 行批次計算一次；每行 CRC 不含換行，與 scan_part 的結果相同
+        part_hash.update(('\n'.join(hashed_lines) + '\n').encode())
+        hashed_lines.clear()
+        if with_manifest:
+            line_crcs.extend(map(zlib.crc32, '\n'.join(manifest_lines).encode().split(b'\n')))
+            manifest_lines.clear()
+
+    def finish_part():
+        if conversion_type:
+            part["length"] = group_bytes(part_units, part_padding, conversion_type)
+        if conversion_type or with_manifest:
+            if hashed_lines:
+                update_digests()
+            part["part_sha256"] = part_hash.hexdigest()
+        if with_manifest:
+            part["block_lines"], part["blocks"] = manifest_blocks(line_crcs)
+
+    try:
+        try:
+            for line in lines:
+                if f is None:
+                    part_number = first_part + len(parts)
+                    output_file_path = os.path.join(output_folder, f"{output_file_name}_{part_number}.txt")
+                    # 先刪除舊檔再建立，避免覆寫到與快取共用的硬連結
+                    if os.path.exists(output_file_path):
+                        os.remove(output_file_path)
+                    f = open(output_file_path, "wb", buffering=WRITE_BUFFER_SIZE)
+                    part = {"path": output_file_path, "part": part_number, "length": 0, "lines": 0}
+                    parts.append(part)
+                    if conversion_type:
+                        pending.append(' ' * HEADER_WIDTH)
+                        if preamble:
+                            pending.append(preamble)
+                        part_units = 0
+                        part_padding = 0
+                    if conversion_type or with_manifest:
+                        part_hash = hashlib.sha256()
+                        hashed_lines = []
+                    if with_manifest:
+                        part["header_lines"] = (2 if preamble else 1) if conversion_type else 0
+                        manifest_lines = []
+                        line_crcs = []
+                output_line = f"{next(timestamps)} {line}{line_crc(line) if with_line_crc else ''}"
+                pending.append(output_line)
+                current_file_size += len(output_line)
+                lines_written += 1
+                part["lines"] += 1
+
+                aligned = True
+                if conversion_type or with_manifest:
+                    hashed_lines.append(line)
+                    if with_manifest:
+                        manifest_lines.append(output_line)
+                    if len(hashed_lines) == WRITE_BATCH_LINES:
+                        update_digests()
+                if conversion_type:
+                    part_units += decoded_size(line, conversion_type)
+                    if conversion_type in GROUP_CHARS:
+                        part_padding += line.count('=')
+                        aligned = part_units % GROUP_CHARS[conversion_type] == 0
+
+                if current_file_size >= max_file_size and aligned:
+                    flush()
+                    writer.close(f)
+                    f = None
+                    current_file_size = 0
+                    logging.info(f"Saved file: {output_file_path}")
+                    finish_part()
+                    if on_part is not None:
+                        writer.call(lambda part=part: on_part(part))
+                elif len(pending) >= WRITE_BATCH_LINES:
+                    flush()
+            if f is not None and pending:
+                flush()
+        finally:
+            if f is not None:
+                writer.close(f)
+            writer.finish()
+    except BaseException as e:
+        # 取消時刪除全部分檔；其他錯誤只刪除未寫完的分檔，已完成的分檔留給續傳
+        remove_parts(parts if isinstance(e, Cancelled) or on_part is None else parts[-1:] if f is not None else [])
+        raise
+    if f is not None:
+        logging.info(f"Saved file: {output_file_path}")
+        finish_part()
+        if on_part is not None:
+            on_part(part)
+    return parts
+
+
+def write_part_headers(parts, fields, parity_parts=()):
+    offset = 0
+    for part in parts:
+        header = format_header({**fields, "part": part["part"], "parts": len(parts), "offset": offset,
+                                "length": part["length"], "part_sha256": part["part_sha256"], "fec": len(parity_parts)})
+        with open(part["path"], "r+b") as f:
+            f.write(header.encode())
+        part["header"] = header
+        part["offset"] = offset
+        offset += part["length"]
+    for part in parity_parts:
+        header = format_header({**fields, "part": part["part"], "parts": len(parts), "offset": 0,
+                                "length": part["length"], "part_sha256": part["part_sha256"], "fec": len(parity_parts)})
+        with open(part["path"], "r+b") as f:
+            f.write(header.encode())
+        part["header"] = header
+
+
+def build_gf_tables():
+    # GF(2^8)，本原多項式 x^8 + x^4 + x^3 + x^2 + 1
+    exp = [0] * 512
+    log = [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= 0x11d
+    for i in range(255, 512):
+        exp[i] = exp[i - 255]
+    return exp, log
+
+
+GF_EXP, GF_LOG = build_gf_tables()
+GF_MUL_TABLES = {}
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def gf_inv(a):
+    return GF_EXP[255 - GF_LOG[a]]
+
+
+def gf_mul_bytes(coefficient, data):
+    # 以 256 bytes 的查表透過 bytes.translate 一次完成整段資料的乘法
+    if coefficient not in GF_MUL_TABLES:
+        GF_MUL_TABLES[coefficient] = bytes(gf_mul(coefficient, x) for x in range(256))
+    return int.from_bytes(data.translate(GF_MUL_TABLES[coefficient]), "little")
+
+
+def cauchy_coefficient(parity_index, data_index):
+    # Cauchy 矩陣的任意方陣皆可逆，因此任 N 個同位分檔可補回任 N 個遺失的資料分檔
+    return gf_inv(parity_index ^ (255 - data_index))
+
+
+def gf_invert_matrix(matrix):
+    size = len(matrix)
+    rows = [row[:] + [1 if i == j else 0 for j in range(size)] for i, row in enumerate(matrix)]
+    for column in range(size):
+        pivot = next(i for i in range(column, size) if rows[i][column])
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        scale = gf_inv(rows[column][column])
+        rows[column] = [gf_mul(scale, value) for value in rows[column]]
+        for i in range(size):
+            if i != column and rows[i][column]:
+                factor = rows[i][column]
+                rows[i] = [value ^ gf_mul(factor, pivot_value) for value, pivot_value in zip(rows[i], rows[column])]
+    return [row[size:] for row in rows]
+
+
+def write_parity_parts(parts, parity_count, conversion_type, width, start_time, end_time,
+                       output_folder, output_file_name, with_line_crc, seed=None, with_manifest=False):
+    if len(parts) + parity_count > 256:
+        raise ValueError("Too many parts for the requested parity parts (at most 256 in total)")
+    lengths = [part["length"] for part in parts]
+    shard_size = max(lengths)
+    parity = [0] * parity_count
+    for k, part in enumerate(parts):
+        data = b"".join(decode_lines(read_payload_lines([part["path"]]), conversion_type)).ljust(shard_size, b"\0")
+        for i in range(parity_count):
+            parity[i] ^= gf_mul_bytes(cauchy_coefficient(i, k), data)
+
+    parity_parts = []
+    preamble = f"{PARITY_LENGTHS_PREFIX} {','.join(map(str, lengths))}"
+    for i, value in enumerate(parity):
+        shard = value.to_bytes(shard_size, "little")
+        blocks = (shard[j:j + BLOCK_SIZE] for j in range(0, shard_size, BLOCK_SIZE))
+        timestamps = generate_timestamps(start_time, end_time, estimate_wrapped_lines(shard_size, conversion_type, width),
+                                         seed=seed)
+        parity_parts += write_parts(wrap_blocks(blocks, conversion_type, width), timestamps, output_folder, output_file_name,
+                                    float("inf"), conversion_type, len(parts) + 1 + i, with_line_crc, preamble,
+                                    with_manifest=with_manifest)
+    return parity_parts
+
+
+def read_parity_lengths(file_path):
+    with open(file_path, "r") as f:
+        for line in f:
+            if line.startswith(PARITY_LENGTHS_PREFIX):
+                return [int(length) for length in line.split()[1].split(",")]
+    raise ValueError(f"{os.path.basename(file_path)} has no part length table")
+
+
+def find_damaged_parts(file_paths, headers, parity_parts):
+    # 驗證每個分檔，損毀的分檔視為遺失 (None)；回傳 (資料分檔, 檔頭, 可用的同位分檔, 說明)
+    file_paths, headers = list(file_paths), list(headers)
+    notes = []
+    for i, (file_path, header) in enumerate(zip(file_paths, headers)):
+        if file_path is None:
+            notes.append(f"part {i + 1} is missing")
+            continue
+        ok, damaged_lines = verify_part(file_path, header)
+        if not ok:
+            lines = f" (damaged lines: {', '.join(map(str, damaged_lines[:20]))})" if damaged_lines else ""
+            notes.append(f"part {i + 1} is corrupt{lines}")
+            file_paths[i] = headers[i] = None
+    usable_parity = []
+    for file_path, header in parity_parts:
+        ok, damaged_lines = verify_part(file_path, header)
+        if ok:
+            usable_parity.append((file_path, header))
+        else:
+            notes.append(f"parity part {header['part']} is corrupt")
+    return file_paths, headers, usable_parity, notes
+
+
+class ShardReader:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+
+    def read(self, size):
+        while len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data.ljust(size, b"\0")
+
+
+def restore_with_parity(file_paths, headers, parity_parts, conversion_type, output_path, progress=None):
+    # 以同位分檔補回遺失或損毀的資料分檔，逐段 (stripe) 處理，記憶體用量與分檔數成正比
+    missing = [k for k, file_path in enumerate(file_paths) if file_path is None]
+    if len(missing) > len(parity_parts):
+        raise ValueError(f"{len(missing)} part(s) are missing or corrupt but only {len(parity_parts)} parity part(s) are usable")
+    parity_parts = parity_parts[:len(missing)]
+    lengths = read_parity_lengths(parity_parts[0][0])
+    offsets = [sum(lengths[:k]) for k in range(len(lengths))]
+    rows = [header["part"] - header["parts"] - 1 for _, header in parity_parts]
+    inverse = gf_invert_matrix([[cauchy_coefficient(i, m) for m in missing] for i in rows])
+    shard_size = parity_parts[0][1]["length"]
+
+    data_readers = {k: ShardReader(decode_lines(read_payload_lines([file_path], [headers[k]]), conversion_type))
+                    for k, file_path in enumerate(file_paths) if file_path is not None}
+    parity_readers = [ShardReader(decode_lines(read_payload_lines([file_path], [header]), conversion_type))
+                      for file_path, header in parity_parts]
+
+    def write_shard(f, k, position, data):
+        if position < lengths[k]:
+            f.seek(offsets[k] + position)
+            f.write(data[:lengths[k] - position])
+
+    with open(output_path, "wb") as f:
+        f.truncate(sum(lengths))
+        for position in range(0, shard_size, FEC_STRIPE_SIZE):
+            if progress is not None:
+                progress(position, shard_size)
+            size = min(FEC_STRIPE_SIZE, shard_size - position)
+            syndromes = [int.from_bytes(reader.read(size), "little") for reader in parity_readers]
+            for k, reader in data_readers.items():
+                data = reader.read(size)
+                write_shard(f, k, position, data)
+                for t, i in enumerate(rows):
+                    syndromes[t] ^= gf_mul_bytes(cauchy_coefficient(i, k), data)
+            syndromes = [value.to_bytes(size, "little") for value in syndromes]
+            for j, m in enumerate(missing):
+                value = 0
+                for t in range(len(rows)):
+                    value ^= gf_mul_bytes(inverse[j][t], syndromes[t])
+                write_shard(f, m, position, value.to_bytes(size, "little"))
+    logging.info(f"Rebuilt part(s) {', '.join(str(m + 1) for m in missing)} from parity")
+    return [m + 1 for m in missing]
+
+
+def order_parts(file_paths):
+    headers = [read_part_header(file_path) for file_path in file_paths]
+    if not any(headers):
+        return file_paths, None, []
+    if not all(headers):
+        raise ValueError("Some of the selected files have no part header")
+
+    first = headers[0]
+    by_part = {}
+    parity_parts = {}
+    for file_path, header in zip(file_paths, headers):
+        if any(header[key] != first[key] for key in ["codec", "size", "sha256", "parts", "width", "fec"]):
+            raise ValueError(f"{os.path.basename(file_path)} belongs to a different conversion")
+        target = parity_parts if header["part"] > header["parts"] else by_part
+        if header["part"] in target:
+            raise ValueError(f"Part {header['part']} was selected more than once")
+        target[header["part"]] = (file_path, header)
+
+    # 遺失的分檔以 None 表示，之後由同位分檔補回
+    missing = [str(i) for i in range(1, first["parts"] + 1) if i not in by_part]
+    if len(missing) > len(parity_parts):
+        raise ValueError(f"Missing part(s): {', '.join(missing)}")
+    ordered = [by_part.get(i, (None, None)) for i in range(1, first["parts"] + 1)]
+    return ([file_path for file_path, _ in ordered], [header for _, header in ordered],
+            [parity_parts[i] for i in sorted(parity_parts)])
+
+
+@dataclass
+class ConvertOptions:
+    # 轉換設定；max_file_size 以 bytes 計
+    conversion_type: str = "Hexadecimal"
+    max_line_length: int = 100
+    max_file_size: int = 3000 * 1024
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    compression: str = "None"
+    delta_base: Optional[str] = None
+    # 舊版接收端不認得 #DUO_TOOLKIT 檔頭，會把它當成資料還原，因此預設不寫
+    write_header: bool = False
+    parallel: bool = False
+    parity_count: int = 0
+    seed: Optional[str] = None
+    cache_dir: Optional[str] = None
+    cache_max_bytes: int = CACHE_MAX_BYTES
+    write_manifest: bool = True
+    # 保存每個輸出名稱最後送出的檔案，未指定 delta_base 時以它為差異基準
+    history_dir: Optional[str] = None
+
+    def validate(self) -> None:
+        if self.conversion_type not in CONVERSION_TYPES:
+            raise ValueError(f"Unknown conversion type: {self.conversion_type}")
+        if self.compression not in COMPRESSION_TYPES:
+            raise ValueError(f"Unknown or unavailable compression type: {self.compression}")
+        if self.start_time is None or self.end_time is None or self.start_time >= self.end_time:
+            raise ValueError("Start time must be earlier than end time.")
+        if self.max_line_length < MIN_LINE_LENGTHS[self.conversion_type] or self.max_file_size <= 0:
+            raise ValueError("Max line length is too short for the conversion type, or max file size is not positive.")
+        if self.parity_count < 0 or (self.parity_count and not self.write_header):
+            raise ValueError("Parity parts must be a non-negative integer and need the part header.")
+        if self.cache_dir and self.cache_max_bytes <= 0:
+            raise ValueError("Cache size limit must be a positive number.")
+        if self.delta_base and (self.compression != "None" or not os.path.isfile(self.delta_base)):
+            raise ValueError("Delta mode needs an existing delta base file and compression set to None "
+                             "(the delta is compressed with LZMA).")
+
+
+@dataclass
+class RestoreOptions:
+    delta_base: Optional[str] = None
+    parallel: bool = False
+    extract: bool = False
+    # 保存每個輸出名稱最後還原的檔案，差異檔未指定 delta_base 時依檔頭的雜湊找出基準
+    history_dir: Optional[str] = None
+
+
+@dataclass
+class RestoreResult:
+    # extract 時 output_path 為解開後的資料夾
+    output_path: str
+    rebuilt_parts: List[int] = field(default_factory=list)
+    extracted: bool = False
+
+
+def output_settings(options):
+    # 會影響輸出內容的設定；parallel、cache_dir 與 write_manifest 不影響分檔內容
+    return [options.conversion_type, options.max_line_length, options.max_file_size, str(options.start_time),
+            str(options.end_time), options.compression, options.write_header, options.parity_count, options.seed]
+
+
+def job_fingerprint(input_paths, options):
+    # 續傳用：以設定與輸入檔的路徑、大小、修改時間判斷是否為同一個工作
+    files = input_paths + ([options.delta_base] if options.delta_base else [])
+    stats = [[os.path.abspath(file_path), os.path.getsize(file_path), os.stat(file_path).st_mtime_ns]
+             for file_path, _ in iter_input_files(files)]
+    return hashlib.sha256(json.dumps([output_settings(options), stats]).encode()).hexdigest()
+
+
+def cache_key(input_paths, options):
+    # 快取用：以設定與輸入內容的雜湊為鍵，路徑與修改時間不同但內容相同時仍可命中
+    contents = [[name, file_sha256(file_path).hex()] for file_path, name in iter_input_files(input_paths)]
+    if options.delta_base:
+        contents.append(["delta_base", file_sha256(options.delta_base).hex()])
+    return hashlib.sha256(json.dumps([output_settings(options), contents]).encode()).hexdigest()
+
+
+def link_or_copy(source, destination):
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def user_cache_dir(tool: str) -> str:
+    # 快取放在使用者的快取資料夾 (Windows 為 %LOCALAPPDATA%)，不寫入目前的工作目錄
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "DUO_ToolKit", "cache", tool)
+
+
+def history_copy(history_dir, name, sha256=None):
+    # 回傳指定雜湊的保存檔；未指定雜湊時回傳最新的一份，沒有時回傳 None
+    folder = os.path.join(history_dir, name)
+    if sha256 is not None:
+        path = os.path.join(folder, sha256.hex())
+        return path if os.path.isfile(path) else None
+    if not os.path.isdir(folder):
+        return None
+    copies = [entry.path for entry in os.scandir(folder) if entry.is_file() and not entry.name.endswith(".tmp")]
+    return max(copies, key=os.path.getmtime, default=None)
+
+
+def keep_copy(history_dir, name, file_path):
+    # 以內容雜湊命名複製一份 (不用硬連結，原檔之後被修改不會影響保存檔)，只保留最新的 HISTORY_COPIES 份
+    folder = os.path.join(history_dir, name)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, file_sha256(file_path).hex())
+    if not os.path.exists(path):
+        shutil.copyfile(file_path, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    os.utime(path)
+    copies = sorted((entry.path for entry in os.scandir(folder) if entry.is_file() and not entry.name.endswith(".tmp")),
+                    key=os.path.getmtime, reverse=True)
+    for old in copies[HISTORY_COPIES:]:
+        os.remove(old)
+    logging.info(f"Kept a copy of {file_path} as the delta base for {name}")
+
+
+def load_cached_parts(cache_dir, key, output_folder, output_file_name):
+    # 命中時驗證快取檔內容後連結/複製到輸出資料夾；快取損毀時刪除該項目並回傳 None
+    entry = os.path.join(cache_dir, key)
+    manifest_path = os.path.join(entry, CACHE_MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            cached_parts = json.load(f)
+        for part in cached_parts:
+            if file_sha256(os.path.join(entry, part["file"])).hex() != part["file_sha256"]:
+                raise ValueError(f"cached {part['file']} was modified")
+    except (OSError, ValueError, KeyError) as e:
+        logging.warning(f"Dropping damaged cache entry {key}: {e}")
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+    parts = []
+    for part in cached_parts:
+        path = os.path.join(output_folder, f"{output_file_name}_{part['part']}.txt")
+        link_or_copy(os.path.join(entry, part["file"]), path)
+        parts.append({**{key: value for key, value in part.items() if key not in ("file", "file_sha256")}, "path": path})
+    os.utime(manifest_path)
+    logging.info(f"Reused {len(parts)} cached part(s) from {entry}")
+    return parts
+
+
+def store_cached_parts(cache_dir, key, parts, max_bytes=CACHE_MAX_BYTES):
+    entry = os.path.join(cache_dir, key)
+    temporary = entry + ".tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    manifest = []
+    for part in parts:
+        name = f"{part['part']}.txt"
+        link_or_copy(part["path"], os.path.join(temporary, name))
+        manifest.append({**{key: value for key, value in part.items() if key != "path"},
+                         "file": name, "file_sha256": file_sha256(part["path"]).hex()})
+    with open(os.path.join(temporary, CACHE_MANIFEST), "w") as f:
+        json.dump(manifest, f)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(temporary, entry)
+    logging.info(f"Stored {len(parts)} part(s) in cache {entry}")
+    evict_cache(cache_dir, max_bytes)
+
+
+def evict_cache(cache_dir, max_bytes=CACHE_MAX_BYTES):
+    entries = []
+    for key in os.listdir(cache_dir):
+        manifest_path = os.path.join(cache_dir, key, CACHE_MANIFEST)
+        if os.path.isfile(manifest_path):
+            size = sum(os.path.getsize(os.path.join(cache_dir, key, name)) for name in os.listdir(os.path.join(cache_dir, key)))
+            entries.append((os.path.getmtime(manifest_path), size, key))
+    total = sum(size for _, size, _ in entries)
+    for _, size, key in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+        total -= size
+        logging.info(f"Evicted cache entry {key}")
+
+
+def load_checkpoint(checkpoint_path, fingerprint):
+    # 回傳檢查點中仍完整存在的分檔；檢查點不符時回傳空串列
+    if not os.path.isfile(checkpoint_path):
+        return []
+    try:
+        with open(checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if checkpoint.get("fingerprint") != fingerprint:
+        return []
+    return [part for part in sorted(checkpoint["parts"], key=lambda part: part["part"])
+            if os.path.isfile(part["path"]) and os.path.getsize(part["path"]) == part["file_size"]]
+
+
+def save_checkpoint(checkpoint_path, fingerprint, parts):
+    with open(checkpoint_path + ".tmp", "w") as f:
+        json.dump({"fingerprint": fingerprint, "parts": parts}, f)
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+def check_inputs(input_paths: List[str], options: ConvertOptions) -> None:
+    if not input_paths or not all(os.path.exists(path) for path in input_paths):
+        raise ValueError("The selected file does not exist.")
+    if options.compression == "None" and (len(input_paths) > 1 or os.path.isdir(input_paths[0])):
+        raise ValueError("Please select only one file for conversion, or choose a compression type to pack several files.")
+    if options.compression == "None" and not options.delta_base and not input_paths[0].endswith(('.zip', '.txt')):
+        raise ValueError("Unsupported file type. Please select a .zip or .txt file, or choose a compression type.")
+    if input_size(input_paths) == 0:
+        raise ValueError("The selected file is empty.")
+
+
+def convert_archive(input_paths: List[str], output_folder: str, output_file_name: str, options: ConvertOptions,
+                    progress: Optional[Callable[[int, int, int], None]] = None,
+                    cancel: Optional[threading.Event] = None) -> List[dict]:
+    # 轉換一個 (或以壓縮打包的多個) 輸入，回傳所有寫出的分檔，含同位分檔
+    # progress(已處理 bytes, 總 bytes, 目前分檔編號)；cancel 設定後拋出 Cancelled 並刪除已寫出的分檔
+    # 有 cache_dir 時相同輸入與設定直接沿用快取；中斷的工作由輸出資料夾中的檢查點接續
+    options.validate()
+    check_inputs(input_paths, options)
+    keep_history = options.history_dir and options.compression == "None"
+    if keep_history and not options.delta_base:
+        base = history_copy(options.history_dir, output_file_name)
+        if base is not None:
+            logging.info(f"Using the last file sent as {output_file_name} as the delta base: {base}")
+            options = replace(options, delta_base=base)
+    conversion_type, width = options.conversion_type, options.max_line_length
+    if options.seed is not None:
+        logging.info(f"Using timestamp seed: {options.seed}")
+    total_bytes = input_size(input_paths)
+
+    key = None
+    if options.cache_dir:
+        key = cache_key(input_paths, options)
+        cached_parts = load_cached_parts(options.cache_dir, key, output_folder, output_file_name)
+        if cached_parts is not None:
+            if options.write_manifest:
+                write_manifest(output_folder, output_file_name, input_paths, options, cached_parts)
+            if keep_history:
+                keep_copy(options.history_dir, output_file_name, input_paths[0])
+            if progress is not None:
+                progress(total_bytes, total_bytes, len(cached_parts))
+            return cached_parts
+
+    checkpoint_path = os.path.join(output_folder, output_file_name + CHECKPOINT_SUFFIX)
+    fingerprint = job_fingerprint(input_paths, options)
+    done_parts = load_checkpoint(checkpoint_path, fingerprint)
+    if done_parts:
+        logging.info(f"Resuming with {len(done_parts)} completed part(s) from {checkpoint_path}")
+
+    def save_part(part):
+        done_parts.append({**part, "file_size": os.path.getsize(part["path"])})
+        save_checkpoint(checkpoint_path, fingerprint, done_parts)
+
+    # 同位分檔需要檔頭記錄的長度與雜湊，並一併加上每行 CRC
+    with_line_crc = options.parity_count > 0
+    archive_hash = hashlib.sha256()
+    total_lines = 1
+
+    def report(lines_written, part):
+        # 以輸出行數換算已處理的輸入量；壓縮與差異模式的總行數為估計值
+        check_cancel(cancel)
+        if progress is not None:
+            progress(min(total_bytes, lines_written * total_bytes // max(total_lines, 1)), total_bytes, part)
+
+    try:
+        if options.parallel and conversion_type in PARALLEL_TYPES and not options.delta_base and options.compression == "None":
+            logging.info("Using parallel conversion")
+            total_lines = count_wrapped_lines(input_paths[0], conversion_type, width)
+            encode_parallel(input_paths[0], conversion_type, width, options.max_file_size, options.start_time,
+                            options.end_time, output_folder, output_file_name, options.write_header,
+                            archive_hash if options.write_header else None, with_line_crc, options.seed, report,
+                            {part["part"] for part in done_parts}, save_part, options.write_manifest)
+        else:
+            # 依序寫出時只能從第 1 個分檔起連續完成的部分接續
+            for i, part in enumerate(done_parts):
+                if part["part"] != i + 1:
+                    del done_parts[i:]
+                    break
+            first_line = lines_done = sum(part["lines"] for part in done_parts)
+            skip_chars = 0
+            if options.delta_base:
+                logging.info(f"Encoding delta against {options.delta_base}")
+                total_lines = estimate_wrapped_lines(compressed_size_bound(input_paths), conversion_type, width)
+                blocks = rebatch_blocks(delta_blocks(options.delta_base, input_paths[0]))
+            elif options.compression != "None":
+                logging.info(f"Compressing input with {options.compression}")
+                total_lines = estimate_wrapped_lines(compressed_size_bound(input_paths), conversion_type, width)
+                blocks = rebatch_blocks(compress_blocks(input_paths, options.compression))
+            elif lines_done and conversion_type in PARALLEL_TYPES:
+                # 固定寬度編碼可直接定位到續傳位置，前段只需計算雜湊
+                total_lines = count_wrapped_lines(input_paths[0], conversion_type, width)
+                start, _, skip_chars = line_byte_range(total_bytes, conversion_type, width, lines_done, total_lines)
+                for block in read_blocks(input_paths[0], end=start):
+                    archive_hash.update(block)
+                blocks = read_blocks(input_paths[0], start=start)
+                lines_done = 0
+            else:
+                total_lines = count_wrapped_lines(input_paths[0], conversion_type, width)
+                blocks = read_blocks(input_paths[0])
+            wrapped_lines = wrap_blocks(hash_blocks(prefetch(blocks), archive_hash), conversion_type, width, skip_chars)
+            # 其他模式重新產生資料流並略過已寫出的行
+            wrapped_lines = islice(wrapped_lines, lines_done, None)
+            timestamps = generate_timestamps(options.start_time, options.end_time, total_lines, first_line, options.seed)
+            write_parts(wrapped_lines, timestamps, output_folder, output_file_name, options.max_file_size,
+                        conversion_type if options.write_header else None, len(done_parts) + 1, with_line_crc,
+                        progress=lambda lines_written, part: report(first_line + lines_written, part), on_part=save_part,
+                        with_manifest=options.write_manifest)
+        parts = sorted(({name: value for name, value in part.items() if name != "file_size"} for part in done_parts),
+                       key=lambda part: part["part"])
+
+        parity_parts = []
+        if options.parity_count:
+            check_cancel(cancel)
+            parity_parts = write_parity_parts(parts, options.parity_count, conversion_type, width, options.start_time,
+                                              options.end_time, output_folder, output_file_name, with_line_crc,
+                                              options.seed, options.write_manifest)
+        if options.write_header:
+            write_part_headers(parts, {"codec": conversion_type, "size": sum(part["length"] for part in parts),
+                                       "sha256": archive_hash.hexdigest(), "width": width}, parity_parts)
+    except Cancelled:
+        # 取消時連同先前續傳留下的分檔與檢查點一併清除
+        remove_parts(done_parts)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        raise
+    os.remove(checkpoint_path)
+    parts += parity_parts
+    if options.write_manifest:
+        write_manifest(output_folder, output_file_name, input_paths, options, parts)
+    if key is not None:
+        store_cached_parts(options.cache_dir, key, parts, options.cache_max_bytes)
+    if keep_history:
+        keep_copy(options.history_dir, output_file_name, input_paths[0])
+    if progress is not None:
+        progress(total_bytes, total_bytes, len(parts))
+    return parts
+
+
+def restore_archive(file_paths: List[str], output_folder: str, output_file_name: str,
+                    options: Optional[RestoreOptions] = None,
+                    progress: Optional[Callable[[int, int, int], None]] = None,
+                    cancel: Optional[threading.Event] = None) -> RestoreResult:
+    # 還原一組分檔；失敗或取消時刪除不完整的輸出
+    # options.extract 時解開到 <輸出資料夾>/<名稱>，可串流的壓縮檔不寫出中間檔
+    # progress(已讀取 bytes, 總 bytes, 目前分檔編號)；cancel 設定後拋出 Cancelled
+    options = options or RestoreOptions()
+    output_path = os.path.join(output_folder, f"{output_file_name}.zip")
+    rebuilt_parts = []
+    file_paths, headers, parity_parts = order_parts(file_paths)
+    if parity_parts:
+        file_paths, headers, parity_parts, notes = find_damaged_parts(file_paths, headers, parity_parts)
+        for note in notes:
+            logging.warning(f"FEC check: {note}")
+    sizes = [os.path.getsize(path) if path else 0 for path in file_paths]
+    total_bytes = sum(sizes)
+
+    def report(done, part):
+        check_cancel(cancel)
+        if progress is not None:
+            progress(min(done, total_bytes), total_bytes, part)
+
+    def tracked_lines():
+        # 逐分檔讀取，每批行數回報一次進度
+        done = 0
+        for i, file_path in enumerate(file_paths):
+            for number, line in enumerate(read_payload_lines([file_path], [headers[i]] if headers else None), 1):
+                if number % DECODE_BATCH_LINES == 0:
+                    report(done + number * (len(line) + TIMESTAMP_WIDTH + 2), i + 1)
+                yield line
+            done += sizes[i]
+            report(done, i + 1)
+
+    if None in file_paths:
+        conversion_type = parity_parts[0][1]["codec"]
+        lines = read_payload_lines([])
+        sample = []
+    elif headers:
+        lines = tracked_lines()
+        conversion_type = headers[0]["codec"]
+        sample = []
+    else:
+        lines = tracked_lines()
+        sample = list(islice(lines, DETECT_SAMPLE_LINES))
+        conversion_type = detect_conversion_type(sample, lambda: islice(read_payload_lines(file_paths), len(sample), None))
+    logging.info(f"Conversion type: {conversion_type}")
+
+    archive_hash = hashlib.sha256()
+    extract_folder = os.path.join(output_folder, output_file_name) if options.extract else None
+    staging = None
+
+    def verify():
+        if headers and archive_hash.hexdigest() != headers[0]["sha256"]:
+            raise ValueError("The restored file does not match the original checksum")
+
+    try:
+        if None in file_paths:
+            # 有分檔遺失或損毀，以同位分檔重建
+            rebuilt_parts = restore_with_parity(file_paths, headers, parity_parts, conversion_type, output_path,
+                                                lambda position, shard_size: report(total_bytes * position // shard_size, 0))
+            headers = [parity_parts[0][1]]
+            for block in read_blocks(output_path):
+                archive_hash.update(block)
+        elif options.parallel and (headers or conversion_type not in GROUP_CHARS):
+            logging.info("Using parallel restoration")
+            lines.close()
+            restore_parallel(file_paths, headers, conversion_type, output_path, report)
+            if headers:
+                for block in read_blocks(output_path):
+                    archive_hash.update(block)
+        else:
+            chunks = hash_blocks(decode_lines(chain(sample, lines), conversion_type), archive_hash)
+            first = next(chunks, b"")
+            # 保存還原檔時需要完整檔案，不串流解開
+            archive_type = streamable_archive(first) if extract_folder and not options.history_dir else None
+            if archive_type:
+                # 先解開到暫存資料夾，驗證通過後才併入目的資料夾
+                logging.info(f"Extracting {archive_type} stream to {extract_folder}")
+                staging = tempfile.mkdtemp(prefix=f".{output_file_name}.", dir=output_folder)
+                extract_stream(chain([first], chunks), archive_type, staging, verify)
+                merge_folder(staging, extract_folder)
+                shutil.rmtree(staging)
+                logging.info(f"Restored and extracted to: {extract_folder}")
+                return RestoreResult(extract_folder, rebuilt_parts, True)
+            with open(output_path, "wb") as f:
+                for chunk in chain([first], chunks):
+                    f.write(chunk)
+        verify()
+        if is_delta(output_path):
+            delta_base = options.delta_base
+            if not delta_base and options.history_dir:
+                delta_base = history_copy(options.history_dir, output_file_name, delta_base_sha256(output_path))
+                if delta_base:
+                    logging.info(f"Using the last file restored as {output_file_name} as the delta base: {delta_base}")
+            if not delta_base or not os.path.isfile(delta_base):
+                raise ValueError("The selected files contain a delta; please select the delta base file")
+            delta_path = output_path + ".delta"
+            os.replace(output_path, delta_path)
+            try:
+                output_path = apply_delta(delta_path, delta_base, output_folder, output_file_name)
+            finally:
+                os.remove(delta_path)
+        else:
+            archive_path = os.path.splitext(output_path)[0] + archive_extension(output_path)
+            if archive_path != output_path:
+                os.replace(output_path, archive_path)
+                output_path = archive_path
+    except Exception:
+        lines.close()
+        if staging is not None:
+            shutil.rmtree(staging, ignore_errors=True)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    logging.info(f"Restored file saved as: {output_path}")
+    if options.history_dir:
+        keep_copy(options.history_dir, output_file_name, output_path)
+    if extract_folder:
+        # 平行、同位重建與差異還原需要完整檔案，還原後再解開並刪除中間檔
+        staging = tempfile.mkdtemp(prefix=f".{output_file_name}.", dir=output_folder)
+        try:
+            extract_archive(output_path, staging)
+            merge_folder(staging, extract_folder)
+        except Exception as e:
+            raise ValueError(f"restored {output_path}, but extraction failed: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        os.remove(output_path)
+        return RestoreResult(extract_folder, rebuilt_parts, True)
+    return RestoreResult(output_path, rebuilt_parts)
+
+
+@dataclass
+class PartStatus:
+    # status 為 "ok"、"damaged"、"missing" 或 "unknown" (無法對應到任何分檔的檔案)
+    part: int
+    path: Optional[str]
+    status: str
+    damaged_lines: List[Tuple[int, int]] = field(default_factory=list)
+    parity: bool = False
+
+
+def line_ranges(numbers):
+    ranges = []
+    for number in sorted(numbers):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], number)
+        else:
+            ranges.append((number, number))
+    return ranges
+
+
+def parse_part_numbers(text):
+    # "3, 7-9" → [3, 7, 8, 9]
+    numbers = set()
+    for item in text.replace(" ", "").split(","):
+        if not item:
+            continue
+        first, _, last = item.partition("-")
+        if not first.isdigit() or (last and not last.isdigit()) or int(first) < 1:
+            raise ValueError(f"Invalid part number: {item}")
+        numbers.update(range(int(first), int(last or first) + 1))
+    if not numbers:
+        raise ValueError("Please enter the part numbers to regenerate, e.g. 3, 7-9")
+    return sorted(numbers)
+
+
+def scan_part(file_path):
+    # 讀取分檔一次，回傳檔頭、內容雜湊、每區塊 CRC 與行尾 CRC 錯誤的行號；換行格式 (CRLF) 不影響結果
+    file_hash = hashlib.sha256()
+    part_hash = hashlib.sha256()
+    header_text = None
+    header_lines = 0
+    lines = 0
+    blocks = []
+    block_crc = 0
+    line_crcs = []
+    damaged_lines = []
+    with open(file_path, "rb") as f:
+        for number, raw in enumerate(f, 1):
+            file_hash.update(raw)
+            line = raw.rstrip(b"\r\n")
+            if line.startswith(b"#"):
+                if number == 1 and line.startswith(HEADER_PREFIX.encode()):
+                    header_text = line.decode(errors="replace")
+                header_lines += 1
+                continue
+            block_crc = zlib.crc32(line, block_crc)
+            line_crcs.append(zlib.crc32(line))
+            lines += 1
+            if lines % MANIFEST_BLOCK_LINES == 0:
+                blocks.append(block_crc)
+                block_crc = 0
+            payload, crc_ok = split_line_crc(strip_timestamp(line.decode(errors="replace")))
+            if not crc_ok:
+                damaged_lines.append(number)
+            if payload:
+                part_hash.update(payload.encode() + b"\n")
+    if lines % MANIFEST_BLOCK_LINES:
+        blocks.append(block_crc)
+    try:
+        header = parse_header(header_text) if header_text else None
+    except (ValueError, KeyError):
+        header = None
+    return {"path": file_path, "header": header, "header_text": header_text, "header_lines": header_lines,
+            "lines": lines, "blocks": blocks, "line_crcs": line_crcs, "part_sha256": part_hash.hexdigest(),
+            "file_sha256": file_hash.hexdigest(), "damaged_lines": damaged_lines}
+
+
+def manifest_blocks(line_crcs, block_lines=None):
+    # 回傳 (每區塊行數, 區塊 CRC)；未指定區塊大小時依行數決定，小分檔也能定位到少數幾行
+    if block_lines is None:
+        block_lines = max(MANIFEST_MIN_BLOCK_LINES, -(-len(line_crcs) // MANIFEST_BLOCKS_PER_PART))
+    blocks = [zlib.crc32(struct.pack(f"<{len(chunk)}I", *chunk))
+              for chunk in (line_crcs[i:i + block_lines] for i in range(0, len(line_crcs), block_lines))]
+    return block_lines, blocks
+
+
+def manifest_path_for(output_folder, output_file_name):
+    return os.path.join(output_folder, f"{output_file_name}{MANIFEST_SUFFIX}")
+
+
+def write_manifest(output_folder, output_file_name, input_paths, options, parts):
+    # 轉換完成後記錄重新產生分檔所需的設定與每個分檔的雜湊
+    # 同位分檔接在資料分檔之後；內容雜湊與區塊 CRC 沿用寫出時記錄的值，舊的快取或檢查點沒有時才重新掃描分檔
+    data_parts = sorted(parts, key=lambda part: part["part"])[:len(parts) - options.parity_count]
+    first_lines = {}
+    line = 0
+    for part in data_parts:
+        first_lines[part["part"]] = line
+        line += part["lines"]
+    entries = []
+    for part in sorted(parts, key=lambda part: part["part"]):
+        if "block_lines" in part:
+            scan = {"lines": part["lines"], "header_text": part.get("header"), "header_lines": part["header_lines"],
+                    "part_sha256": part["part_sha256"], "block_lines": part["block_lines"], "blocks": part["blocks"]}
+        else:
+            scan = scan_part(part["path"])
+            scan["block_lines"], scan["blocks"] = manifest_blocks(scan["line_crcs"])
+        entries.append({"part": part["part"], "file": os.path.basename(part["path"]), "parity": part["part"] not in first_lines,
+                        "first_line": first_lines.get(part["part"], 0), "lines": scan["lines"],
+                        "header": scan["header_text"], "header_lines": scan["header_lines"],
+                        "part_sha256": scan["part_sha256"], "block_lines": scan["block_lines"], "blocks": scan["blocks"]})
+    manifest = {
+        "output_file_name": output_file_name,
+        "inputs": [os.path.abspath(path) for path in input_paths],
+        "options": {"conversion_type": options.conversion_type, "max_line_length": options.max_line_length,
+                    "max_file_size": options.max_file_size, "start_time": options.start_time.isoformat(),
+                    "end_time": options.end_time.isoformat(), "compression": options.compression,
+                    "delta_base": options.delta_base and os.path.abspath(options.delta_base),
+                    "write_header": options.write_header, "parity_count": options.parity_count, "seed": options.seed},
+        "total_lines": line,
+        "parts": entries,
+    }
+    manifest_path = manifest_path_for(output_folder, output_file_name)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    logging.info(f"Saved manifest: {manifest_path}")
+    return manifest_path
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if not isinstance(manifest, dict) or "parts" not in manifest or "options" not in manifest:
+            raise ValueError("missing parts or options")
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{os.path.basename(manifest_path)} is not a valid Tool1 manifest: {e}")
+    return manifest
+
+
+def manifest_options(manifest):
+    fields = dict(manifest["options"])
+    fields["start_time"] = datetime.fromisoformat(fields["start_time"])
+    fields["end_time"] = datetime.fromisoformat(fields["end_time"])
+    return ConvertOptions(**fields)
+
+
+def scan_parts(file_paths, parallel=True, progress=None, cancel=None):
+    # progress(已驗證 bytes, 總 bytes, 0) 在每個分檔驗證完成時呼叫
+    sizes = [os.path.getsize(file_path) for file_path in file_paths]
+    done = 0
+    if not parallel or len(file_paths) < 2:
+        scans = []
+        for file_path, size in zip(file_paths, sizes):
+            check_cancel(cancel)
+            scans.append(scan_part(file_path))
+            done += size
+            if progress is not None:
+                progress(done, sum(sizes), 0)
+        return scans
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {executor.submit(scan_part, file_path): i for i, file_path in enumerate(file_paths)}
+        scans = [None] * len(file_paths)
+        try:
+            for future in as_completed(futures):
+                scans[futures[future]] = future.result()
+                done += sizes[futures[future]]
+                check_cancel(cancel)
+                if progress is not None:
+                    progress(done, sum(sizes), 0)
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+    return scans
+
+
+def compare_with_manifest(scan, entry):
+    # 以 manifest 比對單一分檔，回傳損毀的行範圍 (空串列表示完好)
+    header_damaged = [(1, 1)] if entry["header"] and scan["header_text"] != entry["header"] else []
+    if scan["part_sha256"] == entry["part_sha256"] and scan["lines"] == entry["lines"]:
+        return header_damaged
+    if scan["damaged_lines"]:
+        return header_damaged + line_ranges(scan["damaged_lines"])
+    # 沒有行尾 CRC 時以區塊 CRC 定位；行數不同時，第一個不符的區塊之後全部視為損毀
+    if "block_lines" in entry:
+        block_lines, blocks = manifest_blocks(scan["line_crcs"], entry["block_lines"])
+    else:
+        block_lines, blocks = MANIFEST_BLOCK_LINES, scan["blocks"]
+    offset = entry["header_lines"] + 1
+    last_line = max(scan["lines"], entry["lines"]) + offset - 1
+    ranges = []
+    for i in range(max(len(blocks), len(entry["blocks"]))):
+        if i < len(blocks) and i < len(entry["blocks"]) and blocks[i] == entry["blocks"][i]:
+            continue
+        first = offset + i * block_lines
+        last = last_line if scan["lines"] != entry["lines"] else min(first + block_lines - 1, last_line)
+        if ranges and first == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], last)
+        else:
+            ranges.append((first, last))
+        if scan["lines"] != entry["lines"]:
+            break
+    return header_damaged + (ranges or [(offset, last_line)])
+
+
+def verify_parts(file_paths: List[str], manifest_path: Optional[str] = None, parallel: bool = True,
+                 progress: Optional[Callable[[int, int, int], None]] = None,
+                 cancel: Optional[threading.Event] = None) -> List[PartStatus]:
+    # 驗證收到的分檔；有 manifest 時可找出遺失的分檔與損毀的行範圍，否則依檔頭的雜湊與行尾 CRC 判斷
+    # progress(已驗證 bytes, 總 bytes, 0)
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    scans = scan_parts(file_paths, parallel, progress, cancel)
+    if manifest is not None:
+        entries = {entry["part"]: entry for entry in manifest["parts"]}
+        archive = next((entry["header"] for entry in manifest["parts"] if entry["header"]), None)
+        archive_sha = parse_header(archive)["sha256"] if archive else None
+        data_count = None
+    else:
+        headers = [scan["header"] for scan in scans if scan["header"]]
+        if not headers:
+            raise ValueError("The selected parts have no part header; please also select the manifest")
+        first = headers[0]
+        archive_sha = first["sha256"]
+        data_count = first["parts"]
+        entries = {number: None for number in range(1, first["parts"] + first["fec"] + 1)}
+
+    statuses = {}
+    unknown = []
+    for scan in scans:
+        header = scan["header"]
+        # 先依檔頭對應分檔編號，檔頭損毀時改用檔名中的編號
+        if header and header["sha256"] == archive_sha and header["part"] in entries:
+            number = header["part"]
+        else:
+            match = PART_NUMBER.search(os.path.basename(scan["path"]))
+            number = int(match.group(1)) if match and int(match.group(1)) in entries else None
+        if number is None or number in statuses:
+            unknown.append(PartStatus(0, scan["path"], "unknown"))
+            continue
+        entry = entries[number]
+        if entry is not None:
+            damaged = compare_with_manifest(scan, entry)
+        elif header and header["sha256"] == archive_sha and scan["part_sha256"] == header["part_sha256"]:
+            damaged = []
+        else:
+            damaged = line_ranges(scan["damaged_lines"]) or [(1, scan["header_lines"] + scan["lines"])]
+        parity = entry["parity"] if entry is not None else number > data_count
+        statuses[number] = PartStatus(number, scan["path"], "damaged" if damaged else "ok", damaged, parity)
+    for number, entry in entries.items():
+        if number not in statuses:
+            statuses[number] = PartStatus(number, None, "missing", parity=entry["parity"] if entry else number > data_count)
+    return [statuses[number] for number in sorted(statuses)] + unknown
+
+
+def summarize_verification(statuses):
+    # 產生給使用者看的驗證結果文字，回傳 (全部完好, 說明)
+    bad = [status for status in statuses if status.status in ("damaged", "missing")]
+    lines = []
+    for status in statuses:
+        name = os.path.basename(status.path) if status.path else "-"
+        kind = "parity part" if status.parity else "part"
+        if status.status == "unknown":
+            lines.append(f"{name}: not part of this conversion")
+        elif status.status == "missing":
+            lines.append(f"{kind} {status.part}: missing")
+        elif status.status == "damaged":
+            ranges = ", ".join(f"{first}-{last}" if first != last else str(first) for first, last in status.damaged_lines[:10])
+            lines.append(f"{kind} {status.part} ({name}): damaged, lines {ranges}")
+    known = [status for status in statuses if status.status != "unknown"]
+    # 混入其他轉換的分檔時，以萬用字元還原會把它們一起還原，因此也視為未通過
+    unknown = len(statuses) - len(known)
+    extra = f"\n{unknown} file(s) are not part of this conversion; remove them before restoring" if unknown else ""
+    if not bad:
+        return not unknown, f"All {len(known)} part(s) are intact" + extra + ("\n" + "\n".join(lines) if lines else "")
+    data_bad = [status for status in bad if not status.parity]
+    parity_ok = [status for status in known if status.parity and status.status == "ok"]
+    summary = f"{len(bad)} of {len(known)} part(s) need to be re-sent: {', '.join(str(status.part) for status in bad)}"
+    if data_bad and len(data_bad) <= len(parity_ok):
+        summary += f"\n(restore can also rebuild them from the {len(parity_ok)} intact parity part(s))"
+    return False, summary + extra + "\n" + "\n".join(lines)
+
+
+def regenerate_parts(manifest_path: str, part_numbers: List[int], output_folder: str,
+                     progress: Optional[Callable[[int, int, int], None]] = None,
+                     cancel: Optional[threading.Event] = None) -> List[dict]:
+    # 發送端：依 manifest 以相同設定與種子重新產生指定的分檔，只需重寄這些分檔
+    manifest = load_manifest(manifest_path)
+    entries = {entry["part"]: entry for entry in manifest["parts"]}
+    unknown = [str(number) for number in part_numbers if number not in entries]
+    if unknown:
+        raise ValueError(f"The manifest has no part(s) {', '.join(unknown)} (parts 1-{max(entries)})")
+    inputs = manifest["inputs"]
+    if not all(os.path.exists(path) for path in inputs):
+        raise ValueError(f"The original input is no longer available: {', '.join(inputs)}")
+    options = manifest_options(manifest)
+    if options.delta_base and not os.path.isfile(options.delta_base):
+        raise ValueError(f"The delta base is no longer available: {options.delta_base}")
+    name = manifest["output_file_name"]
+    os.makedirs(output_folder, exist_ok=True)
+
+    selected = [entries[number] for number in part_numbers]
+    if (options.conversion_type in PARALLEL_TYPES and options.compression == "None" and not options.delta_base
+            and not any(entry["parity"] for entry in selected)):
+        # 固定寬度編碼可直接定位，只編碼需要的行範圍
+        size = os.path.getsize(inputs[0])
+        total_lines = count_wrapped_lines(inputs[0], options.conversion_type, options.max_line_length)
+        # 進度以對應的輸入 bytes 表示
+        selected_bytes = sum(entry["lines"] for entry in selected) * size // max(total_lines, 1)
+        lines_done = 0
+        parts = []
+        try:
+            for entry in selected:
+                check_cancel(cancel)
+                part = encode_part({"input_path": inputs[0], "size": size, "codec": options.conversion_type,
+                                    "width": options.max_line_length, "first_line": entry["first_line"],
+                                    "last_line": entry["first_line"] + entry["lines"], "total_lines": total_lines,
+                                    "start_time": options.start_time, "end_time": options.end_time,
+                                    "output_folder": output_folder, "output_file_name": name,
+                                    "write_header": bool(entry["header"]), "part": entry["part"],
+                                    "with_line_crc": options.parity_count > 0, "seed": options.seed,
+                                    "with_manifest": False})
+                parts.append(part)
+                if entry["header"]:
+                    with open(part["path"], "r+b") as f:
+                        f.write(entry["header"].encode())
+                lines_done += entry["lines"]
+                if progress is not None:
+                    progress(lines_done * size // max(total_lines, 1), selected_bytes, entry["part"])
+        except BaseException:
+            remove_parts(parts)
+            raise
+    else:
+        # 壓縮、差異、Decimal 或同位分檔需完整重新轉換，再取出指定的分檔
+        staging = tempfile.mkdtemp(prefix=f".{name}.", dir=output_folder)
+        options.write_manifest = False
+        try:
+            all_parts = convert_archive(inputs, staging, name, options, progress, cancel)
+            by_number = {part["part"]: part for part in all_parts}
+            parts = []
+            for entry in selected:
+                path = os.path.join(output_folder, os.path.basename(by_number[entry["part"]]["path"]))
+                os.replace(by_number[entry["part"]]["path"], path)
+                parts.append({**by_number[entry["part"]], "path": path})
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    # 內容須與原本的分檔一致；有種子時整個檔案 (含時間戳記) 也相同
+    for part, entry in zip(parts, selected):
+        scan = scan_part(part["path"])
+        if scan["part_sha256"] != entry["part_sha256"]:
+            remove_parts(parts)
+            raise ValueError(f"Regenerated part {entry['part']} does not match the manifest; the input has changed since it was converted")
+        if options.seed is None:
+            logging.info(f"Part {entry['part']} regenerated without a seed; its timestamps may differ from the original")
+        logging.info(f"Regenerated file: {part['path']}")
+    return parts
+
+
+# 批次佇列子行程共用的進度佇列與取消事件，由 init_batch_worker 在行程啟動時設定
+batch_updates = None
+batch_cancel = None
+
+
+def init_batch_worker(updates, cancel):
+    global batch_updates, batch_cancel
+    batch_updates, batch_cancel = updates, cancel
+    # 行程結束時不等待尚未送出的進度訊息，避免佇列未被讀完時卡住
+    updates.cancel_join_thread()
+
+
+def convert_batch_job(index, input_paths, output_folder, output_file_name, options):
+    # 批次佇列的子行程進入點；進度以 (index, 已處理 bytes, 總 bytes, 分檔編號) 送回
+    last_sent = 0
+
+    def progress(done, total, part):
+        nonlocal last_sent
+        now = time.monotonic()
+        if now - last_sent >= BATCH_PROGRESS_INTERVAL or done == total:
+            last_sent = now
+            batch_updates.put((index, done, total, part))
+
+    progress(0, input_size(input_paths), 0)
+    created = not os.path.isdir(output_folder)
+    os.makedirs(output_folder, exist_ok=True)
+    try:
+        return convert_archive(input_paths, output_folder, output_file_name, options, progress, batch_cancel)
+    except Cancelled:
+        # 取消時一併移除本工作建立、已清空的子資料夾
+        if created and not os.listdir(output_folder):
+            os.rmdir(output_folder)
+        raise
+
+
+def batched_lines(lines, batch_lines=WRITE_BATCH_LINES):
+    while True:
+        batch = list(islice(lines, batch_lines))
+        if not batch:
+            return
+        yield batch
+
+
+def encode_stream(blocks: Iterable[bytes], total_lines: int, options: ConvertOptions) -> Iterator[str]:
+    # 記憶體內的編碼介面：輸入 bytes 區塊，產生含時間戳記的輸出行 (不含換行，不分檔、不寫檔頭)
+    # total_lines 用於平均分布時間戳記，可用 estimate_wrapped_lines 估算
+    options.validate()
+    timestamps = generate_timestamps(options.start_time, options.end_time, total_lines, seed=options.seed)
+    for line in wrap_blocks(rebatch_blocks(blocks), options.conversion_type, options.max_line_length):
+        yield f"{next(timestamps)} {line}"
+
+
+def decode_stream(lines: Iterable[str], conversion_type: Optional[str] = None) -> Iterator[bytes]:
+    # 記憶體內的還原介面：輸入文字行 (可含時間戳記、檔頭與行尾 CRC)，產生還原後的 bytes；未指定編碼時自動判斷
+    def payload_lines():
+        for number, line in enumerate(lines, 1):
+            line = line.decode() if isinstance(line, bytes) else line
+            if line.startswith("#"):
+                continue
+            payload, crc_ok = split_line_crc(strip_timestamp(line))
+            if not crc_ok:
+                raise ValueError(f"Line {number} is damaged: CRC mismatch")
+            if payload:
+                yield payload
+
+    payloads = payload_lines()
+    sample = list(islice(payloads, DETECT_SAMPLE_LINES))
+    if conversion_type is not None:
+        yield from decode_lines(chain(sample, payloads), conversion_type)
+        return
+    # 判斷編碼需要讀取樣本之後的內容時，先暫存讀過的行再接著解碼
+    with tempfile.TemporaryFile("w+") as spool:
+        def remaining_lines():
+            for line in payloads:
+                spool.write(line + "\n")
+                yield line
+
+        conversion_type = detect_conversion_type(sample, remaining_lines)
+        spool.seek(0)
+        spooled = (line.rstrip("\n") for line in spool)
+        yield from decode_lines(chain(sample, spooled, payloads), conversion_type)
+
+
+def convert_stream(input_file: BinaryIO, output_file: BinaryIO, options: ConvertOptions) -> None:
+    # 串流轉換 (例如 stdin → stdout)：先暫存輸入以得知總行數，時間戳記才能平均分布
+    with tempfile.TemporaryFile() as spool:
+        shutil.copyfileobj(input_file, spool, BLOCK_SIZE)
+        total_lines = estimate_wrapped_lines(spool.tell(), options.conversion_type, options.max_line_length)
+        spool.seek(0)
+        lines = encode_stream(iter(lambda: spool.read(BLOCK_SIZE), b""), total_lines, options)
+        for batch in batched_lines(lines):
+            output_file.write("".join(line + "\n" for line in batch).encode())
+
+
+def restore_stream(input_file: TextIO, output_file: BinaryIO) -> None:
+    for chunk in decode_stream(input_file):
+        output_file.write(chunk)
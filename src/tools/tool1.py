@@ -1,13 +1,102 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton, QFileDialog, QMessageBox, QComboBox, QLineEdit, QScrollArea
-from PyQt6.QtCore import Qt
-import os, re, random, base64, textwrap, logging
+from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton, QFileDialog, QMessageBox, QComboBox, QLineEdit, QScrollArea, QCheckBox, QProgressBar, QTableWidget, QTableWidgetItem
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+import os, time, queue, threading, logging, multiprocessing
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, wait
+from src.core.tool1 import CACHE_MAX_BYTES, user_cache_dir, CONVERSION_TYPES, COMPRESSION_TYPES, Cancelled, ConvertOptions, RestoreOptions, check_inputs, convert_archive, restore_archive, input_size, init_batch_worker, convert_batch_job, MANIFEST_SUFFIX, verify_parts, summarize_verification, regenerate_parts, parse_part_numbers
+
+# 轉換輸出快取放在使用者的快取資料夾，預設不啟用
+CACHE_DIR = user_cache_dir("tool1")
+# 差異模式保存最後送出/還原的檔案
+SENT_DIR = user_cache_dir("tool1_sent")
+RECEIVED_DIR = user_cache_dir("tool1_received")
+
+class Tool1Worker(QThread):
+    # 在背景執行緒執行 job(progress, cancel)，視窗與其他分頁保持可操作
+    progress = pyqtSignal(object, object, int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            result = self.job(self.progress.emit, self.cancel_event)
+        except Cancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(result)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+class Tool1BatchWorker(QThread):
+    # 以行程池同時執行多個轉換工作，才能用到所有 CPU 核心；訊號以工作序號區分
+    progress = pyqtSignal(int, object, object, int)
+    succeeded = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+
+    def __init__(self, jobs, max_workers):
+        super().__init__()
+        self.jobs = jobs
+        self.max_workers = max_workers
+        self.cancel_event = multiprocessing.Event()
+        self.updates = multiprocessing.Queue()
+
+    def run(self):
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_batch_worker,
+                                 initargs=(self.updates, self.cancel_event)) as executor:
+            futures = {executor.submit(convert_batch_job, index, *job): index for index, job in enumerate(self.jobs)}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.2)
+                self.emit_progress()
+                if self.cancel_event.is_set():
+                    # 尚未開始的工作直接取消，執行中的工作在下一個檢查點中止
+                    for future in [future for future in pending if future.cancel()]:
+                        pending.discard(future)
+                        self.cancelled.emit(futures[future])
+                for future in done:
+                    index = futures[future]
+                    try:
+                        result = future.result()
+                    except Cancelled:
+                        self.cancelled.emit(index)
+                    except Exception as e:
+                        self.failed.emit(index, str(e))
+                    else:
+                        self.succeeded.emit(index, result)
+
+    def emit_progress(self):
+        while True:
+            try:
+                index, done, total, part = self.updates.get_nowait()
+            except queue.Empty:
+                return
+            self.progress.emit(index, done, total, part)
+
+    def cancel(self):
+        self.cancel_event.set()
 
 class Tool1(QWidget):
+    # 執行中的 worker 不掛在分頁底下，分頁被關閉或取代時執行緒也不會被提早銷毀
+    running_workers = set()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         logging.info("Initializing Tool1")
+        self.worker = None
         self.init_ui()
+        if QApplication.instance() is not None:
+            QApplication.instance().aboutToQuit.connect(self.stop_job)
 
     def init_ui(self):
         logging.info("Setting up UI")
@@ -24,12 +113,19 @@ class Tool1(QWidget):
         layout.setHorizontalSpacing(10)
 
         self.input_path = QLineEdit(self)
-        self.input_path.setPlaceholderText("Select input file (zip/txt)")
+        self.input_path.setPlaceholderText("Select input file (zip/txt), or logs/folder to compress")
+        input_button_frame = QWidget(self)
+        input_button_layout = QHBoxLayout(input_button_frame)
+        input_button_layout.setContentsMargins(0, 0, 0, 0)
         browse_input_button = QPushButton("Browse")
         browse_input_button.clicked.connect(self.select_input_file)
+        browse_input_folder_button = QPushButton("Folder")
+        browse_input_folder_button.clicked.connect(self.select_input_folder)
+        input_button_layout.addWidget(browse_input_button)
+        input_button_layout.addWidget(browse_input_folder_button)
         layout.addWidget(QLabel("Select input file:"), 0, 0)
         layout.addWidget(self.input_path, 0, 1)
-        layout.addWidget(browse_input_button, 0, 2)
+        layout.addWidget(input_button_frame, 0, 2)
 
         self.output_folder = QLineEdit(self)
         self.output_folder.setPlaceholderText("Select output folder")
@@ -62,40 +158,138 @@ class Tool1(QWidget):
         layout.addWidget(self.max_file_size, 5, 1)
 
         self.conversion_combobox = QComboBox(self)
-        self.conversion_combobox.addItems(["Binary", "Decimal", "Hexadecimal", "Base64"])
+        self.conversion_combobox.addItems(CONVERSION_TYPES)
         self.conversion_combobox.setCurrentText("Hexadecimal")
         layout.addWidget(QLabel("Conversion type:"), 6, 0)
         layout.addWidget(self.conversion_combobox, 6, 1)
 
+        self.compression_combobox = QComboBox(self)
+        self.compression_combobox.addItems(list(COMPRESSION_TYPES))
+        self.compression_combobox.setCurrentText("None")
+        layout.addWidget(QLabel("Compression:"), 7, 0)
+        layout.addWidget(self.compression_combobox, 7, 1)
+
+        self.parity_parts = QLineEdit(self)
+        self.parity_parts.setText("0")
+        self.parity_parts.setToolTip("Extra Reed-Solomon parity parts; restore can rebuild up to this many missing or corrupt parts")
+        layout.addWidget(QLabel("Parity parts (FEC):"), 8, 0)
+        layout.addWidget(self.parity_parts, 8, 1)
+
+        self.delta_base_path = QLineEdit(self)
+        self.delta_base_path.setPlaceholderText("Optional: previously sent file, to send only the changes")
+        browse_delta_base_button = QPushButton("Browse")
+        browse_delta_base_button.clicked.connect(self.select_delta_base)
+        layout.addWidget(QLabel("Delta base:"), 9, 0)
+        layout.addWidget(self.delta_base_path, 9, 1)
+        layout.addWidget(browse_delta_base_button, 9, 2)
+
+        self.history_checkbox = QCheckBox("Send/restore only the changes since the last file with this output name", self)
+        self.history_checkbox.setToolTip(f"Both sides keep a copy of the last file per output name ({SENT_DIR}, {RECEIVED_DIR}) "
+                                         "and use it when no delta base is selected; not used for queued jobs")
+        layout.addWidget(self.history_checkbox, 10, 1)
+
         self.output_file_name = QLineEdit(self)
         self.output_file_name.setText("OutputFileName")
-        layout.addWidget(QLabel("Output file name:"), 7, 0)
-        layout.addWidget(self.output_file_name, 7, 1)
+        layout.addWidget(QLabel("Output file name:"), 11, 0)
+        layout.addWidget(self.output_file_name, 11, 1)
+
+        self.timestamp_seed = QLineEdit(self)
+        self.timestamp_seed.setPlaceholderText("random")
+        self.timestamp_seed.setToolTip("Same seed and same input produce byte-identical parts")
+        layout.addWidget(QLabel("Timestamp seed:"), 12, 0)
+        layout.addWidget(self.timestamp_seed, 12, 1)
+
+        self.header_checkbox = QCheckBox("Write part header (codec, part order, SHA-256; needs this version to restore)", self)
+        self.header_checkbox.setToolTip("Receivers with an older version of this tool restore the header line as data. "
+                                        "Leave unchecked when sending to them. Parity parts need the header.")
+        layout.addWidget(self.header_checkbox, 13, 1)
+
+        self.manifest_checkbox = QCheckBox("Write manifest (needed to locate damaged lines and regenerate parts)", self)
+        self.manifest_checkbox.setChecked(True)
+        layout.addWidget(self.manifest_checkbox, 14, 1)
+
+        self.parallel_checkbox = QCheckBox("Parallel convert/restore (all CPU cores)", self)
+        layout.addWidget(self.parallel_checkbox, 15, 1)
+
+        self.extract_checkbox = QCheckBox("Extract archive after restore", self)
+        layout.addWidget(self.extract_checkbox, 16, 1)
+
+        self.cache_checkbox = QCheckBox("Reuse cached output for unchanged inputs", self)
+        self.cache_checkbox.setToolTip(f"Converted parts are kept in {CACHE_DIR}")
+        layout.addWidget(self.cache_checkbox, 17, 1)
+
+        self.cache_size = QLineEdit(self)
+        self.cache_size.setText(str(CACHE_MAX_BYTES // 1024 // 1024))
+        self.cache_size.setToolTip(f"Oldest cached conversions in {CACHE_DIR} are removed above this size")
+        layout.addWidget(QLabel("Cache size limit (MB):"), 18, 0)
+        layout.addWidget(self.cache_size, 18, 1)
+
+        self.batch_checkbox = QCheckBox("Queue each selected file (or each file in the folder) as a separate job", self)
+        layout.addWidget(self.batch_checkbox, 19, 1)
+
+        self.batch_jobs = QLineEdit(self)
+        self.batch_jobs.setText(str(os.cpu_count() or 1))
+        self.batch_jobs.setToolTip("Number of queued jobs converted at the same time")
+        layout.addWidget(QLabel("Concurrent jobs:"), 20, 0)
+        layout.addWidget(self.batch_jobs, 20, 1)
+
+        self.regenerate_part_numbers = QLineEdit(self)
+        self.regenerate_part_numbers.setPlaceholderText("e.g. 3, 7-9 (select the _manifest.json as input)")
+        self.regenerate_part_numbers.setToolTip("Re-create only the listed parts from the original input, with the same settings and seed")
+        self.regenerate_button = QPushButton("Regenerate")
+        self.regenerate_button.clicked.connect(self.regenerate_selected_parts)
+        layout.addWidget(QLabel("Regenerate parts:"), 21, 0)
+        layout.addWidget(self.regenerate_part_numbers, 21, 1)
+        layout.addWidget(self.regenerate_button, 21, 2)
 
         button_frame = QWidget(self)
         button_layout = QHBoxLayout(button_frame)
         button_layout.setContentsMargins(0, 0, 0, 0)
         button_layout.setSpacing(10)
 
-        convert_button = QPushButton("Convert")
-        convert_button.clicked.connect(self.convert_file)
-        restore_button = QPushButton("Restore")
-        restore_button.clicked.connect(self.restore_file)
+        self.convert_button = QPushButton("Convert")
+        self.convert_button.clicked.connect(self.convert_file)
+        self.restore_button = QPushButton("Restore")
+        self.restore_button.clicked.connect(self.restore_file)
+        self.verify_button = QPushButton("Verify")
+        self.verify_button.setToolTip("Check received parts (and the _manifest.json, if selected) for missing or damaged parts")
+        self.verify_button.clicked.connect(self.verify_files)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_job)
+        self.cancel_button.setEnabled(False)
         about_button = QPushButton("About")
         about_button.clicked.connect(self.show_about)
 
-        button_layout.addWidget(convert_button)
-        button_layout.addWidget(restore_button)
+        button_layout.addWidget(self.convert_button)
+        button_layout.addWidget(self.restore_button)
+        button_layout.addWidget(self.verify_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(about_button)
 
-        layout.addWidget(button_frame, 8, 0, 1, 3)
+        layout.addWidget(button_frame, 22, 0, 1, 3)
 
-        self.result_label = QLabel("", self)
-        layout.addWidget(self.result_label, 9, 0, 1, 3)
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        layout.addWidget(self.progress_bar, 23, 0, 1, 3)
 
-        layout.addWidget(QLabel("Selected files:"), 10, 0, 1, 3)
+        self.result_label = QLabel("", self)
+        layout.addWidget(self.result_label, 24, 0, 1, 3)
+
+        self.queue_label = QLabel("Job queue:")
+        layout.addWidget(self.queue_label, 25, 0, 1, 3)
+        self.queue_table = QTableWidget(0, 3, self)
+        self.queue_table.setHorizontalHeaderLabels(["Input", "Output folder", "Status"])
+        self.queue_table.horizontalHeader().setStretchLastSection(True)
+        self.queue_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.queue_table.setMinimumHeight(200)
+        layout.addWidget(self.queue_table, 26, 0, 1, 3)
+        self.queue_label.setVisible(False)
+        self.queue_table.setVisible(False)
+
+        layout.addWidget(QLabel("Selected files:"), 27, 0, 1, 3)
         self.selected_files_label = QLabel("", self)
-        layout.addWidget(self.selected_files_label, 11, 0, 1, 3)
+        layout.addWidget(self.selected_files_label, 28, 0, 1, 3)
 
         main_layout.addLayout(layout)
         scroll_area.setWidget(container)
@@ -139,6 +333,25 @@ class Tool1(QWidget):
         except Exception as e:
             logging.error(f"Error selecting input file: {e}")
 
+    def select_input_folder(self):
+        try:
+            selected_folder = QFileDialog.getExistingDirectory(self, "Select Input Folder")
+            if selected_folder:
+                self.input_path.setText(selected_folder)
+                self.selected_files_label.setText(selected_folder)
+                logging.info(f"Selected input folder: {selected_folder}")
+        except Exception as e:
+            logging.error(f"Error selecting input folder: {e}")
+
+    def select_delta_base(self):
+        try:
+            selected_file, _ = QFileDialog.getOpenFileName(self, "Select Delta Base File", "", "All Files (*)")
+            if selected_file:
+                self.delta_base_path.setText(selected_file)
+                logging.info(f"Selected delta base: {selected_file}")
+        except Exception as e:
+            logging.error(f"Error selecting delta base: {e}")
+
     def select_output_folder(self):
         try:
             selected_folder = QFileDialog.getExistingDirectory(self, "Select Output Folder")
@@ -165,22 +378,11 @@ class Tool1(QWidget):
     def convert_file(self):
         logging.info("Starting file conversion")
 
-        selected_files = self.input_path.text().split("\n")
-        if len(selected_files) > 1:
-            QMessageBox.critical(self, "Error", "Please select only one file for conversion.")
-            logging.error("Multiple files selected for conversion")
-            return
-
         if not self.input_path.text():
             QMessageBox.critical(self, "Error", "Please select a compressed file.")
             logging.error("No input file selected")
             return
 
-        if not selected_files[0].endswith(('.zip', '.txt')):
-            QMessageBox.critical(self, "Error", "Unsupported file type. Please select a .zip or .txt file.")
-            logging.error("Unsupported file type selected")
-            return
-
         if not self.output_folder.text():
             QMessageBox.critical(self, "Error", "Please select an output folder.")
             logging.error("No output folder selected")
@@ -194,105 +396,174 @@ class Tool1(QWidget):
         try:
             max_line_length = int(self.max_line_length.text())
             max_file_size_kb = int(self.max_file_size.text())
+            parity_count = int(self.parity_parts.text() or 0)
+            cache_max_mb = int(self.cache_size.text())
         except ValueError:
-            QMessageBox.critical(self, "Error", "Max line length and max file size must be valid integers.")
-            logging.error("Invalid max line length or file size")
+            QMessageBox.critical(self, "Error", "Max line length, max file size, parity parts and cache size limit must be valid integers.")
+            logging.error("Invalid max line length, file size, parity parts or cache size limit")
             return
 
         try:
             start_time = datetime.strptime(self.start_time_combobox.currentText(), '%Y/%m/%d %H:%M')
             end_time = datetime.strptime(self.end_time_combobox.currentText(), '%Y/%m/%d %H:%M')
-            if start_time >= end_time:
-                QMessageBox.critical(self, "Error", "Start time must be earlier than end time.")
-                logging.error("Invalid time range")
-                return
         except ValueError as e:
             QMessageBox.critical(self, "Error", f"Invalid time format: {str(e)}")
             logging.error(f"Time format error: {e}")
             return
 
-        if not os.path.exists(selected_files[0]):
-            QMessageBox.critical(self, "Error", "The selected file does not exist.")
-            logging.error("Selected file does not exist")
+        selected_files = self.input_path.text().split("\n")
+        options = ConvertOptions(
+            conversion_type=self.conversion_combobox.currentText(),
+            max_line_length=max_line_length,
+            max_file_size=max_file_size_kb * 1024,
+            start_time=start_time,
+            end_time=end_time,
+            compression=self.compression_combobox.currentText(),
+            delta_base=self.delta_base_path.text().strip() or None,
+            write_header=self.header_checkbox.isChecked(),
+            # 批次佇列已由多個行程同時執行，單一工作內不再平行
+            parallel=self.parallel_checkbox.isChecked() and not self.batch_checkbox.isChecked(),
+            parity_count=parity_count,
+            seed=self.timestamp_seed.text().strip() or None,
+            cache_dir=CACHE_DIR if self.cache_checkbox.isChecked() else None,
+            cache_max_bytes=cache_max_mb * 1024 * 1024,
+            write_manifest=self.manifest_checkbox.isChecked(),
+            # 批次工作共用同一個輸出名稱，不保存歷史檔
+            history_dir=SENT_DIR if self.history_checkbox.isChecked() and not self.batch_checkbox.isChecked() else None,
+        )
+        if self.batch_checkbox.isChecked():
+            self.start_batch(selected_files, options)
             return
 
-        self.result_label.setText("Converting file, please wait...")
-        self.repaint()
-
         try:
-            with open(selected_files[0], "rb") as f:
-                data = f.read()
-            logging.info("Read input file successfully")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error reading file: {str(e)}")
-            logging.error(f"Error reading file: {e}")
+            options.validate()
+            check_inputs(selected_files, options)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            logging.error(f"Invalid conversion settings: {e}")
             return
 
-        conversion_type = self.conversion_combobox.currentText()
-        logging.info(f"Conversion type selected: {conversion_type}")
+        logging.info(f"Conversion type selected: {options.conversion_type}")
+        output_folder, output_file_name = self.output_folder.text(), self.output_file_name.text()
+        self.start_job(lambda progress, cancel: convert_archive(selected_files, output_folder, output_file_name, options,
+                                                                progress, cancel),
+                       self.conversion_finished, "Converting", "Error converting file")
 
+    def start_batch(self, selected_files, options):
         try:
-            if conversion_type == "Binary":
-                converted_data = ' '.join(format(byte, '08b') for byte in data)
-            elif conversion_type == "Decimal":
-                converted_data = ' '.join(str(byte) for byte in data)
-            elif conversion_type == "Hexadecimal":
-                converted_data = ' '.join(format(byte, '02x') for byte in data)
-            elif conversion_type == "Base64":
-                converted_data = base64.b64encode(data).decode()
-            logging.info("Data conversion successful")
-        except Exception as e:
-            logging.error(f"Error during data conversion: {e}")
+            max_workers = int(self.batch_jobs.text())
+            if max_workers < 1:
+                raise ValueError
+        except ValueError:
+            QMessageBox.critical(self, "Error", "Concurrent jobs must be a positive integer.")
+            logging.error("Invalid number of concurrent jobs")
             return
 
-        wrapped_converted_data = textwrap.fill(converted_data, width=int(self.max_line_length.text()))
-
-        output_lines = []
-        wrapped_lines = wrapped_converted_data.split('\n')
-        total_lines = len(wrapped_lines)
-
-        time_delta = (end_time - start_time) / total_lines if total_lines > 0 else timedelta(0)
-        previous_milliseconds = 0
-
-        for i, line in enumerate(wrapped_lines):
-            random_milliseconds = random.randint(previous_milliseconds + 1, 999) if previous_milliseconds < 999 else 999
-            current_time = start_time + time_delta * i + timedelta(milliseconds=random_milliseconds)
-            previous_milliseconds = random_milliseconds
-            timestamp = current_time.strftime('%Y/%m/%d %H:%M:%S.%f')[:-3]
-            output_lines.append(f"{timestamp} {line.strip()}")
-
-        output_text = "\n".join(output_lines)
-        file_data = []
-        current_file_size = 0
-        max_file_size_kb = int(self.max_file_size.text()) * 1024
-        num_files = 1
-
-        for line in output_text.splitlines():
-            file_data.append(line + "\n")
-            current_file_size += len(line.encode('utf-8'))
-
-            if current_file_size >= max_file_size_kb:
-                output_file_path = os.path.join(self.output_folder.text(), f"{self.output_file_name.text()}_{num_files}.txt")
-                with open(output_file_path, "w") as f:
-                    f.writelines(file_data)
-                logging.info(f"Saved file: {output_file_path}")
-                num_files += 1
-                file_data = []
-                current_file_size = 0
-
-        if file_data:
-            output_file_path = os.path.join(self.output_folder.text(), f"{self.output_file_name.text()}_{num_files}.txt")
-            with open(output_file_path, "w") as f:
-                f.writelines(file_data)
-            logging.info(f"Saved file: {output_file_path}")
-
-        self.result_label.setText(f"Conversion successful, saved as {num_files} file(s)")
+        # 只選一個資料夾時，資料夾中的每個檔案各為一個工作
+        if len(selected_files) == 1 and os.path.isdir(selected_files[0]):
+            folder = selected_files[0]
+            selected_files = sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                                    if os.path.isfile(os.path.join(folder, name)))
+        output_folder, output_file_name = self.output_folder.text(), self.output_file_name.text()
+        jobs = []
+        subfolders = set()
+        try:
+            options.validate()
+            if not selected_files:
+                raise ValueError("The selected folder contains no files.")
+            for path in selected_files:
+                try:
+                    check_inputs([path], options)
+                except ValueError as e:
+                    raise ValueError(f"{os.path.basename(path)}: {e}")
+                # 每個工作輸出到以輸入檔名命名的子資料夾，同名時加上序號
+                name = subfolder = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+                number = 1
+                while subfolder in subfolders:
+                    number += 1
+                    subfolder = f"{name}_{number}"
+                subfolders.add(subfolder)
+                jobs.append(([path], os.path.join(output_folder, subfolder), output_file_name, options))
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            logging.error(f"Invalid conversion settings: {e}")
+            return
+
+        logging.info(f"Queued {len(jobs)} conversion job(s), {max_workers} at a time")
+        self.batch_jobs_list = jobs
+        self.batch_sizes = [input_size(job[0]) for job in jobs]
+        self.batch_done = [0] * len(jobs)
+        self.batch_results = {}
+        self.queue_table.setRowCount(len(jobs))
+        for index, (input_paths, job_output_folder, _, _) in enumerate(jobs):
+            self.queue_table.setItem(index, 0, QTableWidgetItem(input_paths[0]))
+            self.queue_table.setItem(index, 1, QTableWidgetItem(job_output_folder))
+            self.queue_table.setItem(index, 2, QTableWidgetItem("Queued"))
+        self.queue_table.resizeColumnsToContents()
+        self.queue_label.setVisible(True)
+        self.queue_table.setVisible(True)
+
+        worker = Tool1BatchWorker(jobs, max_workers)
+        worker.progress.connect(self.batch_progress)
+        worker.succeeded.connect(self.batch_job_succeeded)
+        worker.failed.connect(self.batch_job_failed)
+        worker.cancelled.connect(self.batch_job_cancelled)
+        worker.finished.connect(self.batch_finished)
+        self.run_worker(worker, "Batch converting", "Error converting file")
+
+    def batch_progress(self, index, done, total, part):
+        self.batch_done[index], self.batch_sizes[index] = done, total
+        self.queue_table.item(index, 2).setText(f"Running: {done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB"
+                                                + (f", part {part}" if part else ""))
+        self.update_batch_summary()
+
+    def batch_job_succeeded(self, index, parts):
+        self.batch_results[index] = "succeeded"
+        self.batch_done[index] = self.batch_sizes[index]
+        self.queue_table.item(index, 2).setText(f"Done, {len(parts)} file(s)")
+        logging.info(f"Converted {self.batch_jobs_list[index][0][0]} into {len(parts)} file(s)")
+        self.update_batch_summary()
+
+    def batch_job_failed(self, index, message):
+        self.batch_results[index] = "failed"
+        self.queue_table.item(index, 2).setText(f"Failed: {message}")
+        logging.error(f"{self.job_error_prefix} {self.batch_jobs_list[index][0][0]}: {message}")
+        self.update_batch_summary()
+
+    def batch_job_cancelled(self, index):
+        self.batch_results[index] = "cancelled"
+        self.queue_table.item(index, 2).setText("Cancelled, partial output removed")
+        self.update_batch_summary()
+
+    def update_batch_summary(self):
+        done, total = sum(self.batch_done), sum(self.batch_sizes)
+        elapsed = time.monotonic() - self.job_started
+        speed = done / elapsed if elapsed > 0 else 0
+        eta = f"{(total - done) / speed:.0f} s" if speed > 0 else "-"
+        self.progress_bar.setValue(int(done * 1000 / total) if total else 0)
+        self.result_label.setText(f"{self.job_action}: {len(self.batch_results)} / {len(self.batch_jobs_list)} job(s) finished, "
+                                  f"{done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB, "
+                                  f"{speed / 1024 / 1024:.1f} MB/s, ETA {eta}")
+
+    def batch_finished(self):
+        counts = {state: list(self.batch_results.values()).count(state) for state in ("succeeded", "failed", "cancelled")}
+        self.result_label.setText(f"Batch finished: {counts['succeeded']} succeeded, {counts['failed']} failed, "
+                                  f"{counts['cancelled']} cancelled")
+        logging.info(f"Batch conversion finished: {counts}")
+        if counts["failed"]:
+            QMessageBox.critical(self, "Error", f"{counts['failed']} of {len(self.batch_jobs_list)} job(s) failed; "
+                                                "see the job queue for details.")
+
+    def conversion_finished(self, parts):
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        self.result_label.setText(f"Conversion successful, saved as {len(parts)} file(s)")
         logging.info("File conversion completed successfully")
 
     def restore_file(self):
         logging.info("Starting file restoration")
 
-        selected_files = self.input_path.text().split("\n")
+        # 一併選取的 manifest 不參與還原
+        selected_files = [file for file in self.input_path.text().split("\n") if not file.endswith(MANIFEST_SUFFIX)]
         if not selected_files:
             QMessageBox.critical(self, "Error", "Please select files for restoration.")
             logging.error("No files selected for restoration")
@@ -313,60 +584,163 @@ class Tool1(QWidget):
             logging.error("Empty output file name")
             return
 
-        self.result_label.setText("Restoring file, please wait...")
-        self.repaint()
-
-        combined_data = []
         for file in selected_files:
             if not os.path.exists(file):
                 QMessageBox.critical(self, "Error", f"The file {file} does not exist.")
                 logging.error(f"File does not exist: {file}")
                 return
 
-            try:
-                with open(file, "r") as f:
-                    combined_data.extend(f.readlines())
-                logging.info(f"Read file: {file}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Error reading file: {str(e)}")
-                logging.error(f"Error reading file: {e}")
-                return
+        options = RestoreOptions(delta_base=self.delta_base_path.text().strip() or None,
+                                 parallel=self.parallel_checkbox.isChecked(),
+                                 extract=self.extract_checkbox.isChecked(),
+                                 history_dir=RECEIVED_DIR if self.history_checkbox.isChecked() else None)
+        output_folder, output_file_name = self.output_folder.text(), self.output_file_name.text()
 
-        clean_data = []
-        for line in combined_data:
-            clean_line = re.sub(r'^\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2}\.\d{3}\s+', '', line)
-            clean_data.append(clean_line.strip())
+        def job(progress, cancel):
+            return restore_archive(selected_files, output_folder, output_file_name, options, progress, cancel)
 
-        clean_data = ' '.join(clean_data)
+        self.start_job(job, self.restoration_finished, "Restoring", "Failed to decode data")
 
-        try:
-            if all(len(b) == 8 for b in clean_data.split()):  # 二進制
-                byte_data = bytearray([int(b, 2) for b in clean_data.split()])
-            elif all(b.isdigit() for b in clean_data.split()):  # 十進制
-                byte_data = bytearray([int(b) for b in clean_data.split()])
-            elif all(all(c in '0123456789abcdefABCDEF' for c in b) and len(b) % 2 == 0 for b in clean_data.split()):  # 十六進制
-                byte_data = bytearray([int(b, 16) for b in clean_data.split()])
-            else:
-                byte_data = base64.b64decode(clean_data)
-            logging.info("Data restoration successful")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to decode data: {str(e)}")
-            logging.error(f"Error decoding data: {e}")
+    def restoration_finished(self, result):
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        if result.extracted:
+            self.result_label.setText(f"Restoration successful, extracted to {result.output_path}")
+            logging.info("File restoration completed successfully")
             return
 
-        output_path = os.path.join(self.output_folder.text(), f"{self.output_file_name.text()}.zip")
-        try:
-            with open(output_path, "wb") as f:
-                f.write(byte_data)
-            logging.info(f"Restored file saved as: {output_path}")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error writing restored file: {str(e)}")
-            logging.error(f"Error writing restored file: {e}")
+        if result.rebuilt_parts:
+            self.result_label.setText(f"Restoration successful, saved as {result.output_path} "
+                                      f"(rebuilt part(s) {', '.join(map(str, result.rebuilt_parts))} from parity)")
+            logging.info("File restoration completed successfully")
             return
 
-        self.result_label.setText(f"Restoration successful, saved as {output_path}")
+        self.result_label.setText(f"Restoration successful, saved as {result.output_path}")
         logging.info("File restoration completed successfully")
 
+    def verify_files(self):
+        logging.info("Starting part verification")
+
+        selected_files = [file for file in self.input_path.text().split("\n") if file]
+        manifests = [file for file in selected_files if file.endswith(MANIFEST_SUFFIX)]
+        part_files = [file for file in selected_files if not file.endswith(MANIFEST_SUFFIX)]
+        if not part_files or not all(file.endswith(".txt") for file in part_files) or len(manifests) > 1:
+            QMessageBox.critical(self, "Error", "Please select the received .txt parts, and optionally one _manifest.json.")
+            logging.error("Invalid file selection for verification")
+            return
+
+        for file in selected_files:
+            if not os.path.exists(file):
+                QMessageBox.critical(self, "Error", f"The file {file} does not exist.")
+                logging.error(f"File does not exist: {file}")
+                return
+
+        manifest_path = manifests[0] if manifests else None
+        parallel = self.parallel_checkbox.isChecked()
+        self.start_job(lambda progress, cancel: verify_parts(part_files, manifest_path, parallel, progress, cancel),
+                       self.verification_finished, "Verifying", "Failed to verify parts")
+
+    def verification_finished(self, statuses):
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        intact, report = summarize_verification(statuses)
+        self.result_label.setText(report.split("\n")[0])
+        logging.info(f"Verification result: {report}")
+        QMessageBox.information(self, "Verify", report)
+
+    def regenerate_selected_parts(self):
+        logging.info("Starting part regeneration")
+
+        manifest_path = self.input_path.text().strip()
+        if not manifest_path.endswith(MANIFEST_SUFFIX) or not os.path.isfile(manifest_path):
+            QMessageBox.critical(self, "Error", "Please select the _manifest.json written next to the converted parts.")
+            logging.error("No manifest selected for regeneration")
+            return
+
+        if not self.output_folder.text():
+            QMessageBox.critical(self, "Error", "Please select an output folder.")
+            logging.error("No output folder selected")
+            return
+
+        try:
+            part_numbers = parse_part_numbers(self.regenerate_part_numbers.text())
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            logging.error(f"Invalid part numbers: {e}")
+            return
+
+        output_folder = self.output_folder.text()
+        self.start_job(lambda progress, cancel: regenerate_parts(manifest_path, part_numbers, output_folder, progress, cancel),
+                       self.regeneration_finished, "Regenerating", "Error regenerating parts")
+
+    def regeneration_finished(self, parts):
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        self.result_label.setText(f"Regenerated {len(parts)} part(s): "
+                                  f"{', '.join(os.path.basename(part['path']) for part in parts)}")
+        logging.info("Part regeneration completed successfully")
+
+    def start_job(self, job, on_success, action, error_prefix):
+        worker = Tool1Worker(job)
+        worker.progress.connect(self.update_progress)
+        worker.succeeded.connect(on_success)
+        worker.failed.connect(self.job_failed)
+        worker.cancelled.connect(self.job_cancelled)
+        self.run_worker(worker, action, error_prefix)
+
+    def run_worker(self, worker, action, error_prefix):
+        self.job_action = action
+        self.job_error_prefix = error_prefix
+        self.job_started = time.monotonic()
+        self.convert_button.setEnabled(False)
+        self.restore_button.setEnabled(False)
+        self.verify_button.setEnabled(False)
+        self.regenerate_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.result_label.setText(f"{action} file, please wait...")
+
+        self.worker = worker
+        self.worker.finished.connect(self.job_finished)
+        Tool1.running_workers.add(self.worker)
+        self.worker.start()
+
+    def update_progress(self, done, total, part):
+        elapsed = time.monotonic() - self.job_started
+        speed = done / elapsed if elapsed > 0 else 0
+        eta = f"{(total - done) / speed:.0f} s" if speed > 0 else "-"
+        self.progress_bar.setValue(int(done * 1000 / total) if total else 0)
+        self.result_label.setText(f"{self.job_action}: {done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB, "
+                                  f"{speed / 1024 / 1024:.1f} MB/s, ETA {eta}" + (f", part {part}" if part else ""))
+
+    def job_failed(self, message):
+        QMessageBox.critical(self, "Error", f"{self.job_error_prefix}: {message}")
+        logging.error(f"{self.job_error_prefix}: {message}")
+        self.progress_bar.setValue(0)
+        self.result_label.setText("")
+
+    def job_cancelled(self):
+        self.progress_bar.setValue(0)
+        self.result_label.setText(f"{self.job_action} cancelled, partial output removed")
+        logging.info(f"{self.job_action} cancelled by user")
+
+    def job_finished(self):
+        Tool1.running_workers.discard(self.sender())
+        self.convert_button.setEnabled(True)
+        self.restore_button.setEnabled(True)
+        self.verify_button.setEnabled(True)
+        self.regenerate_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+    def cancel_job(self):
+        if self.worker is not None and self.worker.isRunning():
+            logging.info(f"Cancelling: {self.job_action}")
+            self.cancel_button.setEnabled(False)
+            self.worker.cancel()
+
+    def stop_job(self):
+        # 程式結束時先取消並等待背景工作，避免執行緒在執行中被銷毀
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+
     def show_about(self):
         logging.info("Showing about dialog")
         QMessageBox.information(self, "About", 
@@ -380,7 +754,9 @@ class Tool1(QWidget):
                                 "   Binary_output.txt: 104 MB\n"
                                 "   Decimal_output.txt: 41.0 MB\n"
                                 "   Hexadecimal_output.txt: 34.7 MB\n"
+                                "   Base32_output.txt: 18.6 MB\n"
                                 "   Base64_output.txt: 15.5 MB\n"
+                                "   Base85_output.txt: 14.6 MB\n"
                                 "4. Restored Size: 9.24 MB; Uncompressed Size: 174 MB\n\n"
                                 "===============================================\n\n"
                                 "此工具使用方式是將壓縮檔案轉換成字串，請客戶信件寄出後，\n"
@@ -393,5 +769,7 @@ class Tool1(QWidget):
                                 "   Binary_output.txt: 104 MB\n"
                                 "   Decimal_output.txt: 41.0 MB\n"
                                 "   Hexadecimal_output.txt: 34.7 MB\n"
+                                "   Base32_output.txt: 18.6 MB\n"
                                 "   Base64_output.txt: 15.5 MB\n"
+                                "   Base85_output.txt: 14.6 MB\n"
                                 "4. 還原後共 9.24 MB，解壓縮後共 174 MB")
\ No newline at end of file
@@ -1,13 +1,47 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton, QFileDialog, QMessageBox, QComboBox, QLineEdit, QScrollArea
-from PyQt6.QtCore import Qt
-import os, re, random, base64, textwrap, logging
+from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QPushButton, QFileDialog, QMessageBox, QComboBox, QLineEdit, QScrollArea, QProgressBar, QCheckBox
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+import os, time, threading, logging
 from datetime import datetime, timedelta
+from src.core.tool1 import Cancelled
+from src.core.tool2 import LOG_TYPES, check_log_inputs, convert_logs, merge_logs, build_index, follow_logs
+
+class Tool2Worker(QThread):
+    # 在背景執行緒執行 job(progress, cancel)，解析數 GB 的 log 時視窗仍可操作
+    progress = pyqtSignal(object, object, int)
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.cancel_event = threading.Event()
+
+    def run(self):
+        try:
+            result = self.job(self.progress.emit, self.cancel_event)
+        except Cancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(result)
+
+    def cancel(self):
+        self.cancel_event.set()
 
 class Tool2(QWidget):
+    # 執行中的 worker 不掛在分頁底下，分頁被關閉或取代時執行緒也不會被提早銷毀
+    running_workers = set()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         logging.info("Initializing Tool2")
+        self.worker = None
         self.init_ui()
+        if QApplication.instance() is not None:
+            QApplication.instance().aboutToQuit.connect(self.stop_job)
 
     def init_ui(self):
         logging.info("Setting up UI")
@@ -40,7 +74,7 @@ class Tool2(QWidget):
         layout.addWidget(browse_output_button, 1, 2)
 
         self.conversion_combobox = QComboBox(self)
-        self.conversion_combobox.addItems(["COM16", "COM17", "COM18", "COM20"])
+        self.conversion_combobox.addItems(LOG_TYPES)
         self.conversion_combobox.setCurrentText("COM16")
         layout.addWidget(QLabel("Log type:"), 2, 0)
         layout.addWidget(self.conversion_combobox, 2, 1)
@@ -50,27 +84,66 @@ class Tool2(QWidget):
         layout.addWidget(QLabel("Output file name:"), 3, 0)
         layout.addWidget(self.output_file_name, 3, 1)
 
+        self.parallel_checkbox = QCheckBox("Parallel parsing (all CPU cores)", self)
+        layout.addWidget(self.parallel_checkbox, 4, 1)
+
+        self.merge_checkbox = QCheckBox("Merge the selected logs into one timeline (log type detected per file)", self)
+        layout.addWidget(self.merge_checkbox, 5, 1)
+
+        self.time_window_checkbox = QCheckBox("Only records between the start and end time (uses the log index)", self)
+        layout.addWidget(self.time_window_checkbox, 6, 1)
+
+        # 可直接輸入到秒，例如警報前後 10 分鐘: 2024/10/17 14:00:00
+        self.start_time_combobox = QComboBox(self)
+        self.start_time_combobox.setEditable(True)
+        self.start_time_combobox.addItems(self.generate_time_options())
+        self.start_time_combobox.setCurrentIndex(0)
+        layout.addWidget(QLabel("Start time:"), 7, 0)
+        layout.addWidget(self.start_time_combobox, 7, 1)
+
+        self.end_time_combobox = QComboBox(self)
+        self.end_time_combobox.setEditable(True)
+        self.end_time_combobox.addItems(self.generate_time_options())
+        self.end_time_combobox.setCurrentIndex(self.end_time_combobox.count() - 1)
+        layout.addWidget(QLabel("End time:"), 8, 0)
+        layout.addWidget(self.end_time_combobox, 8, 1)
+
         button_frame = QWidget(self)
         button_layout = QHBoxLayout(button_frame)
         button_layout.setContentsMargins(0, 0, 0, 0)
         button_layout.setSpacing(10)
 
-        convert_button = QPushButton("Convert")
-        convert_button.clicked.connect(self.convert_file)
+        self.convert_button = QPushButton("Convert")
+        self.convert_button.clicked.connect(self.convert_file)
+        self.follow_button = QPushButton("Follow")
+        self.follow_button.clicked.connect(self.follow_files)
+        self.index_button = QPushButton("Build Index")
+        self.index_button.clicked.connect(self.build_indexes)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_job)
+        self.cancel_button.setEnabled(False)
         about_button = QPushButton("About")
         about_button.clicked.connect(self.show_about)
 
-        button_layout.addWidget(convert_button)
+        button_layout.addWidget(self.convert_button)
+        button_layout.addWidget(self.follow_button)
+        button_layout.addWidget(self.index_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(about_button)
 
-        layout.addWidget(button_frame, 4, 0, 1, 3)
+        layout.addWidget(button_frame, 9, 0, 1, 3)
+
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        layout.addWidget(self.progress_bar, 10, 0, 1, 3)
 
         self.result_label = QLabel("", self)
-        layout.addWidget(self.result_label, 5, 0, 1, 3)
+        layout.addWidget(self.result_label, 11, 0, 1, 3)
 
-        layout.addWidget(QLabel("Selected files:"), 6, 0, 1, 3)
+        layout.addWidget(QLabel("Selected files:"), 12, 0, 1, 3)
         self.selected_files_label = QLabel("", self)
-        layout.addWidget(self.selected_files_label, 7, 0, 1, 3)
+        layout.addWidget(self.selected_files_label, 13, 0, 1, 3)
 
         main_layout.addLayout(layout)
         scroll_area.setWidget(container)
@@ -106,7 +179,7 @@ class Tool2(QWidget):
 
     def select_input_file(self):
         try:
-            selected_files, _ = QFileDialog.getOpenFileNames(self, "Select Input File", "", "All Files (*)")
+            selected_files, _ = QFileDialog.getOpenFileNames(self, "Select Input File", "", "Log Files (*.log *.txt *.bak *.csv);;All Files (*)")
             if selected_files:
                 self.input_path.setText("\n".join(selected_files))
                 self.selected_files_label.setText("\n".join(selected_files))
@@ -123,18 +196,98 @@ class Tool2(QWidget):
         except Exception as e:
             logging.error(f"Error selecting output folder: {e}")
 
+    def generate_time_options(self):
+        now = datetime.now()
+        options = []
+        try:
+            for day_offset in range(-3, 1):
+                current_day = now + timedelta(days=day_offset)
+                for hour in range(0, 24, 3):
+                    time_option = current_day.replace(hour=hour, minute=0).strftime('%Y/%m/%d %H:00')
+                    options.append(time_option)
+            logging.info("Generated time options")
+        except Exception as e:
+            logging.error(f"Error generating time options: {e}")
+        return options
+
+    def parse_time(self, text):
+        try:
+            return datetime.strptime(text.strip(), '%Y/%m/%d %H:%M:%S')
+        except ValueError:
+            return datetime.strptime(text.strip(), '%Y/%m/%d %H:%M')
+
     def convert_file(self):
         logging.info("Starting file conversion")
 
+        if not self.input_path.text():
+            QMessageBox.critical(self, "Error", "Please select log files for conversion.")
+            logging.error("No files selected for conversion")
+            return
+
+        if not self.output_folder.text():
+            QMessageBox.critical(self, "Error", "Please select an output folder.")
+            logging.error("No output folder selected")
+            return
+
+        if not self.output_file_name.text().strip():
+            QMessageBox.critical(self, "Error", "Output file name cannot be empty.")
+            logging.error("Empty output file name")
+            return
+
         selected_files = self.input_path.text().split("\n")
-        if not selected_files:
-            QMessageBox.critical(self, "Error", "Please select files for restoration.")
-            logging.error("No files selected for restoration")
+        log_type = self.conversion_combobox.currentText()
+        try:
+            check_log_inputs(selected_files, log_type)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            logging.error(f"Invalid conversion settings: {e}")
             return
 
-        if not all(file.endswith(".txt") for file in selected_files):
-            QMessageBox.critical(self, "Error", "Please select valid .txt files for restoration.")
-            logging.error("Invalid file type for restoration")
+        start_time = end_time = None
+        if self.time_window_checkbox.isChecked():
+            try:
+                start_time = self.parse_time(self.start_time_combobox.currentText())
+                end_time = self.parse_time(self.end_time_combobox.currentText())
+            except ValueError as e:
+                QMessageBox.critical(self, "Error", f"Invalid time format: {str(e)}")
+                logging.error(f"Time format error: {e}")
+                return
+            if start_time > end_time:
+                QMessageBox.critical(self, "Error", "Start time must be earlier than end time.")
+                logging.error("Start time later than end time")
+                return
+
+        logging.info(f"Conversion type selected: {log_type}")
+        output_folder, output_file_name = self.output_folder.text(), self.output_file_name.text().strip()
+        if self.merge_checkbox.isChecked():
+            self.start_job(lambda progress, cancel: merge_logs(selected_files, output_folder, output_file_name, log_type,
+                                                               progress, cancel, start_time, end_time),
+                           self.merge_finished, "Merging", "Error merging files")
+            return
+
+        parallel = self.parallel_checkbox.isChecked()
+        self.start_job(lambda progress, cancel: convert_logs(selected_files, output_folder, output_file_name, log_type,
+                                                             progress, cancel, parallel, start_time, end_time),
+                       self.conversion_finished, "Converting", "Error converting file")
+
+    def conversion_finished(self, outputs):
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        records = sum(output["records"] for output in outputs)
+        self.result_label.setText(f"Conversion successful, {records} record(s) saved as {len(outputs)} file(s)")
+        logging.info("File conversion completed successfully")
+
+    def merge_finished(self, output):
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        self.result_label.setText(f"Merge successful, {output['records']} record(s) from {len(output['inputs'])} file(s) "
+                                  f"saved as {os.path.basename(output['path'])}")
+        logging.info("File merge completed successfully")
+
+    def follow_files(self):
+        logging.info("Starting follow mode")
+
+        if not self.input_path.text():
+            QMessageBox.critical(self, "Error", "Please select log files to follow.")
+            logging.error("No files selected for follow mode")
             return
 
         if not self.output_folder.text():
@@ -147,26 +300,133 @@ class Tool2(QWidget):
             logging.error("Empty output file name")
             return
 
-        self.result_label.setText("Converting file, please wait...")
-        self.repaint()
+        selected_files = self.input_path.text().split("\n")
+        log_type = self.conversion_combobox.currentText()
+        try:
+            check_log_inputs(selected_files, log_type)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            logging.error(f"Invalid follow settings: {e}")
+            return
+
+        output_folder, output_file_name = self.output_folder.text(), self.output_file_name.text().strip()
+        self.start_job(lambda progress, cancel: follow_logs(selected_files, output_folder, output_file_name, log_type,
+                                                            progress, cancel),
+                       self.following_finished, "Following", "Error following file", self.follow_progress)
+
+    def follow_progress(self, done, total, records):
+        # 追趕既有內容時顯示進度，之後每次有新資料時更新記錄數與時間
+        self.progress_bar.setValue(int(done * 1000 / total) if total else 0)
+        self.result_label.setText(f"Following: {records} record(s), {done / 1024 / 1024:.1f} MB, "
+                                  f"updated {time.strftime('%H:%M:%S')}; press Cancel to stop")
 
+    def following_finished(self, outputs):
+        records = sum(output["records"] for output in outputs)
+        self.result_label.setText(f"Stopped following, {records} record(s) saved in {len(outputs)} file(s)")
+        logging.info("Follow mode stopped")
+
+    def build_indexes(self):
+        logging.info("Starting index build")
+
+        if not self.input_path.text():
+            QMessageBox.critical(self, "Error", "Please select log files to index.")
+            logging.error("No files selected for indexing")
+            return
+
+        selected_files = self.input_path.text().split("\n")
+        log_type = self.conversion_combobox.currentText()
         try:
-            with open(selected_files[0], "rb") as f:
-                data = f.read()
-            logging.info("Read input file successfully")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Error reading file: {str(e)}")
-            logging.error(f"Error reading file: {e}")
+            check_log_inputs(selected_files, log_type)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            logging.error(f"Invalid index settings: {e}")
             return
 
-        conversion_type = self.conversion_combobox.currentText()
-        logging.info(f"Conversion type selected: {conversion_type}")
+        def job(progress, cancel):
+            total = sum(os.path.getsize(path) for path in selected_files)
+            indexes, done = [], 0
+            for number, path in enumerate(selected_files, 1):
+                indexes.append(build_index(path, log_type, lambda offset, size, _: progress(done + offset, total, number),
+                                           cancel))
+                done += os.path.getsize(path)
+            return indexes
 
-        # 轉換代碼
+        self.start_job(job, self.indexing_finished, "Indexing", "Error building index")
 
-        logging.info("File conversion completed successfully")
+    def indexing_finished(self, indexes):
+        self.progress_bar.setValue(self.progress_bar.maximum())
+        records = sum(index["records"] for index in indexes)
+        self.result_label.setText(f"Index ready for {len(indexes)} file(s), {records} record(s)")
+        logging.info("Index build completed successfully")
+
+    def start_job(self, job, on_success, action, error_prefix, on_progress=None):
+        self.job_action = action
+        self.job_error_prefix = error_prefix
+        self.job_started = time.monotonic()
+        self.convert_button.setEnabled(False)
+        self.follow_button.setEnabled(False)
+        self.index_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.result_label.setText(f"{action} file, please wait...")
+
+        self.worker = Tool2Worker(job)
+        self.worker.progress.connect(on_progress or self.update_progress)
+        self.worker.succeeded.connect(on_success)
+        self.worker.failed.connect(self.job_failed)
+        self.worker.cancelled.connect(self.job_cancelled)
+        self.worker.finished.connect(self.job_finished)
+        Tool2.running_workers.add(self.worker)
+        self.worker.start()
+
+    def update_progress(self, done, total, index):
+        elapsed = time.monotonic() - self.job_started
+        speed = done / elapsed if elapsed > 0 else 0
+        eta = f"{(total - done) / speed:.0f} s" if speed > 0 else "-"
+        self.progress_bar.setValue(int(done * 1000 / total) if total else 0)
+        self.result_label.setText(f"{self.job_action}: {done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB, "
+                                  f"{speed / 1024 / 1024:.1f} MB/s, ETA {eta}, file {index}")
+
+    def job_failed(self, message):
+        QMessageBox.critical(self, "Error", f"{self.job_error_prefix}: {message}")
+        logging.error(f"{self.job_error_prefix}: {message}")
+        self.progress_bar.setValue(0)
+        self.result_label.setText("")
+
+    def job_cancelled(self):
+        self.progress_bar.setValue(0)
+        self.result_label.setText(f"{self.job_action} cancelled, partial output removed")
+        logging.info(f"{self.job_action} cancelled by user")
+
+    def job_finished(self):
+        Tool2.running_workers.discard(self.sender())
+        self.convert_button.setEnabled(True)
+        self.follow_button.setEnabled(True)
+        self.index_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+
+    def cancel_job(self):
+        if self.worker is not None and self.worker.isRunning():
+            logging.info(f"Cancelling: {self.job_action}")
+            self.cancel_button.setEnabled(False)
+            self.worker.cancel()
+
+    def stop_job(self):
+        # 程式結束時先取消並等待背景工作，避免執行緒在執行中被銷毀
+        if self.worker is not None and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
 
     def show_about(self):
         logging.info("Showing about dialog")
         QMessageBox.information(self, "About", 
-                                "")
\ No newline at end of file
+                                "This tool parses COM16/17/18/20 port logs (.log/.txt/.bak/.csv) into records\n"
+                                "and saves them as CSV with the columns timestamp, port, direction, payload and fields.\n"
+                                "Lines that do not start with a timestamp are appended to the previous record.\n"
+                                "Parallel parsing splits large logs at record boundaries; the output is the same.\n"
+                                "Merge writes one OutputFileName.csv with the records of all selected logs in time order.\n"
+                                "Follow keeps converting the data appended to growing logs until Cancel is pressed;\n"
+                                "rotated or truncated logs are followed from the start of the new file.\n"
+                                "Build Index saves <log>.index.json next to each log so a start/end time window\n"
+                                "is read without scanning the whole file. The index is updated when the log grows.\n"
+                                "Selecting several files writes OutputFileName_1.csv, OutputFileName_2.csv, ...")
\ No newline at end of file
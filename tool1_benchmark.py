@@ -0,0 +1,307 @@
+import sys
+import os
+import json
+import time
+import random
+import shutil
+import hashlib
+import logging
+import zlib
+import zipfile
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from src.core.tool1 import CONVERSION_TYPES, PARALLEL_TYPES, BLOCK_SIZE, ConvertOptions, RestoreOptions, convert_archive, \
+    restore_archive, convert_stream, restore_stream, encode_stream, decode_stream, estimate_wrapped_lines
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Tool1 編碼/還原效能測試：產生固定內容的 zip 與 log 輸入，量測各編碼與模式的速度、記憶體與膨脹率
+# 例: python tool1_benchmark.py --sizes 1,10,100 -o benchmark_results
+#     python tool1_benchmark.py --sizes 10 --compare benchmark_results/baseline.json
+# 每次量測在獨立的子行程執行，峰值記憶體才不會互相影響
+
+MODES = ["serial", "parallel", "stream", "memory"]
+INPUT_KINDS = ["zip", "log"]
+LOG_LEVELS = ["INFO"] * 8 + ["DEBUG"] * 4 + ["WARN", "ERROR"]
+LOG_MODULES = ["sensor", "motor", "vision", "network", "scheduler", "storage", "power", "io"]
+LOG_EVENTS = ["reading", "status", "heartbeat", "retry", "calibrate", "sync", "flush", "timeout"]
+# 輸出各分檔大小與時間範圍沿用 GUI 預設值
+PART_SIZE = 3000 * 1024
+LINE_LENGTH = 100
+
+
+def generate_log(path, size, seed):
+    # 產生類似機台 log 的文字，內容由 seed 決定，壓縮率接近實際 log
+    rng = random.Random(seed)
+    written = 0
+    second = 0
+    with open(path, "wb") as f:
+        while written < size:
+            lines = []
+            for _ in range(4096):
+                second += rng.randint(0, 3)
+                lines.append(f"2024/01/{1 + second // 86400 % 28:02d} {second // 3600 % 24:02d}:{second // 60 % 60:02d}:"
+                             f"{second % 60:02d}.{rng.randint(0, 999):03d} [{rng.choice(LOG_LEVELS)}] "
+                             f"{rng.choice(LOG_MODULES)}.{rng.choice(LOG_EVENTS)} id={rng.randint(0, 65535):04x} "
+                             f"value={rng.gauss(100, 15):.3f} count={rng.randint(0, 1000)}\n")
+            chunk = "".join(lines).encode()[:size - written]
+            f.write(chunk)
+            written += len(chunk)
+
+
+def generate_input(folder, kind, size_mb, seed):
+    # 依種類與大小產生輸入檔，已存在時直接沿用；zip 以壓縮後的大小為準
+    size = size_mb * 1024 * 1024
+    if kind == "log":
+        log_path = os.path.join(folder, f"log_{size_mb}mb.txt")
+        if not os.path.exists(log_path):
+            logging.info(f"Generating {log_path}")
+            generate_log(log_path, size, seed)
+        return log_path
+    zip_path = os.path.join(folder, f"logs_{size_mb}mb.zip")
+    if not os.path.exists(zip_path):
+        logging.info(f"Generating {zip_path}")
+        # 先以 1 MB 樣本估計壓縮率，再產生壓縮後約為指定大小的 log
+        sample_path = os.path.join(folder, "sample.log")
+        generate_log(sample_path, 1024 * 1024, seed)
+        with open(sample_path, "rb") as f:
+            ratio = len(zlib.compress(f.read(), 6)) / (1024 * 1024)
+        log_path = os.path.join(folder, f"machine_{size_mb}mb.log")
+        generate_log(log_path, int(size / ratio), seed)
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(log_path, "machine.log")
+        os.remove(sample_path)
+        os.remove(log_path)
+    return zip_path
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def peak_rss_mb():
+    # 本行程與其已結束子行程 (平行模式的行程池) 的峰值記憶體；無法量測時回傳 None
+    if resource is not None:
+        usage = [resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+        # macOS 的單位為 bytes，Linux 為 KB
+        return max(usage) / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss) / 1024 / 1024
+    return None
+
+
+def benchmark_options(conversion_type, parallel, seed):
+    return ConvertOptions(conversion_type=conversion_type, max_line_length=LINE_LENGTH, max_file_size=PART_SIZE,
+                          start_time=datetime(2024, 1, 1), end_time=datetime(2024, 1, 2), parallel=parallel, seed=seed)
+
+
+def run_encode(task):
+    input_path, work, mode = task["input"], task["work"], task["mode"]
+    options = benchmark_options(task["type"], mode == "parallel", task["seed"])
+    if mode in ("serial", "parallel"):
+        parts = convert_archive([input_path], work, "Bench", options)
+        return {"outputs": [part["path"] for part in parts]}
+    output_path = os.path.join(work, "Bench.txt")
+    if mode == "stream":
+        with open(input_path, "rb") as input_file, open(output_path, "wb") as output_file:
+            convert_stream(input_file, output_file, options)
+    else:
+        with open(input_path, "rb") as f:
+            data = f.read()
+        total_lines = estimate_wrapped_lines(len(data), options.conversion_type, options.max_line_length)
+        text = "".join(line + "\n" for line in encode_stream([data], total_lines, options))
+        with open(output_path, "w") as f:
+            f.write(text)
+    return {"outputs": [output_path]}
+
+
+def run_restore(task):
+    work, mode = task["work"], task["mode"]
+    if mode in ("serial", "parallel"):
+        result = restore_archive(task["outputs"], work, "Restored", RestoreOptions(parallel=mode == "parallel"))
+        return {"restored": result.output_path}
+    restored_path = os.path.join(work, "Restored.bin")
+    if mode == "stream":
+        with open(task["outputs"][0], "r") as input_file, open(restored_path, "wb") as output_file:
+            restore_stream(input_file, output_file)
+    else:
+        with open(task["outputs"][0], "r") as f:
+            lines = f.read().splitlines()
+        data = b"".join(decode_stream(lines, task["type"]))
+        with open(restored_path, "wb") as f:
+            f.write(data)
+    return {"restored": restored_path}
+
+
+def run_child(task):
+    # 子行程進入點：執行一個階段，將耗時與峰值記憶體以 JSON 輸出到 stdout
+    started = time.perf_counter()
+    result = run_encode(task) if task["phase"] == "encode" else run_restore(task)
+    result["seconds"] = time.perf_counter() - started
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_phase(task):
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "_child", json.dumps(task)],
+                               capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "child failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(input_path, kind, conversion_type, mode, work_folder, seed):
+    size = os.path.getsize(input_path)
+    work = tempfile.mkdtemp(dir=work_folder)
+    task = {"input": input_path, "type": conversion_type, "mode": mode, "seed": seed, "work": work}
+    try:
+        encoded = run_phase({**task, "phase": "encode"})
+        restored = run_phase({**task, "phase": "restore", "outputs": encoded["outputs"]})
+        output_size = sum(os.path.getsize(path) for path in encoded["outputs"])
+        return {
+            "input": kind, "input_mb": round(size / 1024 / 1024, 3), "type": conversion_type, "mode": mode,
+            "encode_s": round(encoded["seconds"], 3), "encode_mb_s": round(size / 1024 / 1024 / encoded["seconds"], 2),
+            "restore_s": round(restored["seconds"], 3), "restore_mb_s": round(size / 1024 / 1024 / restored["seconds"], 2),
+            "encode_peak_rss_mb": encoded["peak_rss_mb"] and round(encoded["peak_rss_mb"], 1),
+            "restore_peak_rss_mb": restored["peak_rss_mb"] and round(restored["peak_rss_mb"], 1),
+            "expansion": round(output_size / size, 3), "parts": len(encoded["outputs"]),
+            "verified": file_sha256(restored["restored"]) == file_sha256(input_path),
+        }
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def result_key(result):
+    return f"{result['input']}/{result['input_mb']}/{result['type']}/{result['mode']}"
+
+
+def compare(results, baseline_path, threshold):
+    # 與先前的報告比較，編碼或還原速度下降超過 threshold 視為效能退步
+    with open(baseline_path, "r") as f:
+        baseline = {result_key(result): result for result in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if previous is None:
+            continue
+        for metric in ("encode_mb_s", "restore_mb_s"):
+            if result[metric] < previous[metric] * (1 - threshold):
+                regressions.append(f"{result_key(result)} {metric}: {previous[metric]} -> {result[metric]} MB/s")
+    return regressions
+
+
+def write_report(report, output_folder):
+    os.makedirs(output_folder, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    json_path = os.path.join(output_folder, f"tool1_benchmark_{stamp}.json")
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    columns = ["input", "input_mb", "type", "mode", "encode_mb_s", "restore_mb_s", "encode_peak_rss_mb",
+               "restore_peak_rss_mb", "expansion", "parts", "verified"]
+    lines = [f"# Tool1 benchmark {report['date']}", "",
+             f"Python {report['python']}, {report['platform']}, {report['cpu_count']} CPU(s)", "",
+             "| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    for result in report["results"]:
+        lines.append("| " + " | ".join(str(result.get(column, "")) for column in columns) + " |")
+    for failure in report["failures"]:
+        lines.append(f"\nFAILED {failure}")
+    if report.get("regressions"):
+        lines += ["", "## Regressions", ""] + [f"- {regression}" for regression in report["regressions"]]
+    markdown_path = os.path.join(output_folder, f"tool1_benchmark_{stamp}.md")
+    with open(markdown_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return json_path, markdown_path
+
+
+def parse_list(text, choices, convert=str):
+    values = [convert(value.strip()) for value in text.split(",") if value.strip()]
+    if choices is not None and any(value not in choices for value in values):
+        raise argparse.ArgumentTypeError(f"choose from {', '.join(map(str, choices))}")
+    return values
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark Tool1 codecs on synthetic zip and log inputs")
+    parser.add_argument("--sizes", type=lambda text: parse_list(text, None, int), default=[1, 10, 100],
+                        help="input sizes in MB, e.g. 1,10,100,1024")
+    parser.add_argument("--inputs", type=lambda text: parse_list(text, INPUT_KINDS), default=INPUT_KINDS)
+    parser.add_argument("--types", type=lambda text: parse_list(text, CONVERSION_TYPES), default=CONVERSION_TYPES)
+    parser.add_argument("--modes", type=lambda text: parse_list(text, MODES), default=MODES)
+    parser.add_argument("--seed", default="benchmark", help="seed for the generated inputs and timestamps")
+    parser.add_argument("--work", help="folder for generated inputs and outputs (default: a temporary folder)")
+    parser.add_argument("-o", "--output", default="benchmark_results", help="folder for the JSON/Markdown report")
+    parser.add_argument("--compare", help="previous JSON report; exit 1 when throughput drops by more than --threshold")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed throughput drop for --compare")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_child"]:
+        print(json.dumps(run_child(json.loads(argv[1]))))
+        return 0
+
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+    # 子行程在程式所在資料夾執行，路徑一律轉為絕對路徑
+    work_folder = os.path.abspath(args.work or tempfile.mkdtemp(prefix="tool1_benchmark_"))
+    os.makedirs(work_folder, exist_ok=True)
+
+    results, failures = [], []
+    try:
+        for size_mb in args.sizes:
+            for kind in args.inputs:
+                input_path = generate_input(work_folder, kind, size_mb, args.seed)
+                for conversion_type in args.types:
+                    for mode in args.modes:
+                        if mode == "parallel" and conversion_type not in PARALLEL_TYPES:
+                            continue
+                        name = f"{kind} {size_mb} MB {conversion_type} {mode}"
+                        try:
+                            result = measure(input_path, kind, conversion_type, mode, work_folder, args.seed)
+                        except Exception as e:
+                            failures.append(f"{name}: {e}")
+                            print(f"FAILED {name}: {e}", file=sys.stdout)
+                            logging.error(f"{name}: {e}")
+                            continue
+                        results.append(result)
+                        print(f"{name}: encode {result['encode_mb_s']} MB/s, restore {result['restore_mb_s']} MB/s, "
+                              f"x{result['expansion']}, {result['parts']} part(s)"
+                              + ("" if result["verified"] else ", RESTORED OUTPUT DIFFERS"), file=sys.stdout)
+    finally:
+        if not args.work:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    report = {"date": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+              "platform": platform.platform(), "cpu_count": os.cpu_count(), "results": results, "failures": failures}
+    if args.compare:
+        report["regressions"] = compare(results, args.compare, args.threshold)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression}", file=sys.stdout)
+    json_path, markdown_path = write_report(report, args.output)
+    print(f"Report saved as {json_path} and {markdown_path}", file=sys.stdout)
+    unverified = [result for result in results if not result["verified"]]
+    return 1 if failures or unverified or report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
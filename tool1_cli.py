@@ -0,0 +1,249 @@
+import sys
+import os
+import re
+import glob
+import time
+import logging
+import argparse
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.core.tool1 import CACHE_MAX_BYTES, CONVERSION_TYPES, COMPRESSION_TYPES, ConvertOptions, RestoreOptions, convert_archive, \
+    restore_archive, convert_stream, restore_stream, input_size, verify_parts, summarize_verification, regenerate_parts, \
+    parse_part_numbers, read_part_header
+
+# 不載入 PyQt 的 Tool1 命令列版本，供排程批次轉換/還原使用
+# 例: python tool1_cli.py convert -o out -t Base64 logs/*.zip
+#     python tool1_cli.py restore -o restored "out/*_*.txt"
+#     type archive.zip | python tool1_cli.py convert - > archive.txt
+#     python tool1_cli.py verify "received/*_*.txt" --manifest out/archive_manifest.json
+#     python tool1_cli.py regenerate out/archive_manifest.json --parts 3,7-9 -o resend
+
+PART_NAME = re.compile(r"^(.*)_(\d+)\.txt$")
+
+
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise ValueError(f"No files match {pattern}")
+        paths.extend(matches)
+    return paths
+
+
+def group_parts(paths):
+    # 依 <名稱>_<編號>.txt 將分檔分組，每組還原為一個檔案；組內依編號數值排序 (x_2 在 x_10 之前)
+    groups = {}
+    for path in paths:
+        match = PART_NAME.match(os.path.basename(path))
+        name = match.group(1) if match else os.path.splitext(os.path.basename(path))[0]
+        groups.setdefault(name, []).append((int(match.group(2)) if match else 0, path))
+    return {name: [path for _, path in sorted(parts)] for name, parts in groups.items()}
+
+
+def check_part_numbers(name, file_paths):
+    # 沒有檔頭的分檔只能依檔名編號還原，編號重複或不連續時會還原出錯誤的檔案
+    numbers = [int(match.group(2)) if match else None
+               for match in (PART_NAME.match(os.path.basename(path)) for path in file_paths)]
+    duplicates = sorted({number for number in numbers if number is not None and numbers.count(number) > 1})
+    if duplicates:
+        raise ValueError(f"Part(s) {', '.join(map(str, duplicates))} selected more than once")
+    if len(file_paths) < 2 or read_part_header(file_paths[0]) is not None:
+        return
+    if None in numbers:
+        raise ValueError("Parts without a header need <name>_<n>.txt file names to be restored in order")
+    if sorted(numbers) != list(range(1, len(numbers) + 1)):
+        missing = [str(number) for number in range(1, max(numbers) + 1) if number not in numbers]
+        raise ValueError(f"Parts must be numbered from 1 without gaps; missing part(s): {', '.join(missing)}")
+
+
+def convert_options(args):
+    return ConvertOptions(
+        conversion_type=args.type,
+        max_line_length=args.width,
+        max_file_size=args.size * 1024,
+        start_time=datetime.strptime(args.start, '%Y/%m/%d %H:%M'),
+        end_time=datetime.strptime(args.end, '%Y/%m/%d %H:%M'),
+        compression=args.compression,
+        delta_base=args.delta_base,
+        write_header=args.header,
+        parallel=args.parallel,
+        parity_count=args.parity,
+        seed=args.seed,
+        cache_dir=args.cache,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        write_manifest=not args.no_manifest,
+        history_dir=args.delta_history,
+    )
+
+
+def output_names(paths):
+    # 輸出名稱取自輸入檔名；不同資料夾中的同名輸入加上序號 (x、x_2)，避免寫到同一組分檔與 manifest
+    names = []
+    for path in paths:
+        name = unique = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+        number = 1
+        while unique in names:
+            number += 1
+            unique = f"{name}_{number}"
+        names.append(unique)
+    return names
+
+
+def run_convert(input_path, output_folder, name, options):
+    started = time.perf_counter()
+    parts = convert_archive([input_path], output_folder, name, options)
+    output_size = sum(os.path.getsize(part["path"]) for part in parts)
+    return input_size([input_path]), output_size, len(parts), time.perf_counter() - started
+
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(folder) for name in names)
+
+
+def run_restore(name, file_paths, output_folder, options):
+    started = time.perf_counter()
+    check_part_numbers(name, file_paths)
+    result = restore_archive(file_paths, output_folder, name, options)
+    if result.rebuilt_parts:
+        logging.warning(f"{name}: rebuilt part(s) {', '.join(map(str, result.rebuilt_parts))} from parity")
+    output_bytes = folder_size(result.output_path) if result.extracted else os.path.getsize(result.output_path)
+    input_bytes = sum(os.path.getsize(path) for path in file_paths)
+    return input_bytes, output_bytes, len(file_paths), time.perf_counter() - started
+
+
+def report(name, result, out):
+    input_bytes, output_bytes, parts, seconds = result
+    throughput = input_bytes / 1024 / 1024 / seconds if seconds > 0 else 0
+    print(f"OK     {name}: {input_bytes / 1024 / 1024:.2f} MB -> {output_bytes / 1024 / 1024:.2f} MB, "
+          f"{parts} part(s), {seconds:.2f} s, {throughput:.1f} MB/s", file=out)
+
+
+def parse_args(argv):
+    now = datetime.now().replace(second=0, microsecond=0)
+    parser = argparse.ArgumentParser(description="Tool1 batch convert/restore without the GUI")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert files to timestamped text parts")
+    convert.add_argument("inputs", nargs="+", help="files, folders or glob patterns; '-' reads stdin and writes stdout")
+    convert.add_argument("-o", "--output", default=".", help="output folder")
+    convert.add_argument("-t", "--type", default="Hexadecimal", choices=CONVERSION_TYPES)
+    convert.add_argument("-w", "--width", type=int, default=100, help="max line length")
+    convert.add_argument("-s", "--size", type=int, default=3000, help="max part size in KB")
+    convert.add_argument("--start", default=(now - timedelta(days=1)).strftime('%Y/%m/%d %H:%M'), help="YYYY/MM/DD HH:MM")
+    convert.add_argument("--end", default=now.strftime('%Y/%m/%d %H:%M'), help="YYYY/MM/DD HH:MM")
+    convert.add_argument("-c", "--compression", default="None", choices=list(COMPRESSION_TYPES))
+    convert.add_argument("--delta-base", help="encode only the difference against this file")
+    convert.add_argument("--delta-history", metavar="DIR",
+                         help="keep the last file sent per output name here and use it when --delta-base is not given")
+    header = convert.add_mutually_exclusive_group()
+    header.add_argument("--header", dest="header", action="store_true",
+                        help="write part headers (codec, part order, SHA-256); older receivers cannot restore them")
+    header.add_argument("--no-header", dest="header", action="store_false", help="do not write part headers (default)")
+    convert.add_argument("--parity", type=int, default=0, help="number of parity parts (FEC)")
+    convert.add_argument("--seed", help="timestamp seed for byte-identical output")
+    convert.add_argument("--cache", metavar="DIR", help="reuse and store converted parts in this cache folder")
+    convert.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_BYTES // 1024 // 1024,
+                         help="remove the oldest cached conversions above this size")
+    convert.add_argument("--no-manifest", action="store_true",
+                         help="do not write <name>_manifest.json (verify then needs part headers; regenerate is unavailable)")
+
+    restore = commands.add_parser("restore", help="restore text parts; parts are grouped by <name>_<n>.txt")
+    restore.add_argument("inputs", nargs="+", help="part files or glob patterns; '-' reads stdin and writes stdout")
+    restore.add_argument("-o", "--output", default=".", help="output folder")
+    restore.add_argument("--delta-base", help="base file for delta parts")
+    restore.add_argument("--delta-history", metavar="DIR",
+                         help="keep the last file restored per output name here and use it when --delta-base is not given")
+    restore.add_argument("-x", "--extract", action="store_true", help="extract into <output>/<name> instead of writing the archive")
+
+    verify = commands.add_parser("verify", help="find missing or damaged parts of one conversion")
+    verify.add_argument("inputs", nargs="+", help="part files or glob patterns")
+    verify.add_argument("--manifest", help="the _manifest.json written by convert, to locate damaged lines")
+    verify.add_argument("--serial", action="store_true", help="scan the parts in this process only")
+
+    regenerate = commands.add_parser("regenerate", help="re-create selected parts from the original input")
+    regenerate.add_argument("manifest", help="the _manifest.json written by convert")
+    regenerate.add_argument("--parts", required=True, help="part numbers, e.g. 3,7-9")
+    regenerate.add_argument("-o", "--output", default=".", help="output folder")
+
+    for command in (convert, restore):
+        command.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="archives processed concurrently")
+        command.add_argument("--parallel", action="store_true", help="also split each archive across processes")
+    return parser.parse_args(argv)
+
+
+def run_verify(args):
+    statuses = verify_parts(expand_inputs(args.inputs), args.manifest, not args.serial)
+    intact, text = summarize_verification(statuses)
+    print(text, file=sys.stdout)
+    return 0 if intact else 1
+
+
+def run_regenerate(args):
+    parts = regenerate_parts(args.manifest, parse_part_numbers(args.parts), args.output)
+    for part in parts:
+        print(f"OK     {part['path']}", file=sys.stdout)
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+
+    if args.command in ("verify", "regenerate"):
+        # 驗證結果 0 為全部完好、1 為有分檔需重寄；設定或檔案錯誤為 2
+        try:
+            return run_verify(args) if args.command == "verify" else run_regenerate(args)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            logging.error(f"Tool1 CLI error: {e}")
+            return 2
+
+    try:
+        if args.command == "convert":
+            options = convert_options(args)
+            options.validate()
+        else:
+            options = RestoreOptions(delta_base=args.delta_base, parallel=args.parallel, extract=args.extract,
+                                     history_dir=args.delta_history)
+        if args.inputs == ["-"]:
+            if args.command == "convert":
+                convert_stream(sys.stdin.buffer, sys.stdout.buffer, options)
+            else:
+                restore_stream(sys.stdin, sys.stdout.buffer)
+            return 0
+        inputs = expand_inputs(args.inputs)
+        os.makedirs(args.output, exist_ok=True)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        logging.error(f"Tool1 CLI error: {e}")
+        return 2
+
+    failures = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        if args.command == "convert":
+            jobs = {}
+            for path, name in zip(inputs, output_names(inputs)):
+                renamed = name != os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+                jobs[executor.submit(run_convert, path, args.output, name, options)] = f"{path} (as {name})" if renamed else path
+        else:
+            jobs = {executor.submit(run_restore, name, paths, args.output, options): name
+                    for name, paths in group_parts(inputs).items()}
+        for job in as_completed(jobs):
+            try:
+                report(jobs[job], job.result(), sys.stdout)
+            except Exception as e:
+                failures += 1
+                print(f"FAILED {jobs[job]}: {e}", file=sys.stdout)
+                logging.error(f"{jobs[job]}: {e}")
+    print(f"{len(jobs) - failures}/{len(jobs)} succeeded in {time.perf_counter() - started:.2f} s", file=sys.stdout)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())